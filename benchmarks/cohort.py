@@ -0,0 +1,97 @@
+"""Synthetic cohorts and timing helpers for the benchmarks.
+
+Also writes a cohort as CSV files that pw6's Import CSV accepts:
+
+    python benchmarks/cohort.py 10000 50 --density 0.3 --out /tmp/cohort
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PW6_DIR = os.path.join(ROOT_DIR, "pw6")
+VERSIONS = ("pw4", "pw5", "pw6")
+
+
+def use_version(version):
+    """Make one practical's modules importable; they share names, so use one per process"""
+    path = os.path.join(ROOT_DIR, version)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def use_pw6():
+    """Make pw6's modules importable from a benchmark script"""
+    use_version("pw6")
+
+
+def generate_rows(n_students, n_courses, density=0.3, seed=0):
+    """Return (student rows, course rows, mark rows) as plain tuples
+
+    Each student takes about density of the courses; marks are in tenths from 0 to 20
+    like the ones input and import store.
+    """
+    rng = random.Random(seed)
+    students = [(f"S{i:06d}", f"Student {i}", f"{2000 + i % 8}-{1 + i % 12:02d}-{1 + i % 28:02d}")
+                for i in range(n_students)]
+    courses = [(f"C{j:04d}", f"Course {j}", rng.randint(1, 5)) for j in range(n_courses)]
+    marks = [(student[0], course[0], rng.randint(0, 200) / 10)
+             for student in students for course in courses if rng.random() < density]
+    return students, courses, marks
+
+
+def make_cohort(n_students, n_courses, density=0.3, seed=0):
+    """Return pw6 (students, courses, marks) with each student taking about density of the courses"""
+    use_pw6()
+    from domains import Student, Course, MarkStore
+
+    student_rows, course_rows, mark_rows = generate_rows(n_students, n_courses, density, seed)
+    students = [Student(*row) for row in student_rows]
+    courses = [Course(*row) for row in course_rows]
+    marks = MarkStore()
+    for student_id, course_id, mark in mark_rows:
+        marks[(student_id, course_id)] = mark
+    return students, courses, marks
+
+
+def best_of(repeats, func):
+    """Fastest wall-clock time of repeats calls to func, in seconds"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def write_csv(directory, n_students, n_courses, density=0.3, seed=0):
+    """Write students.csv, courses.csv and marks.csv with the headers bulk_import expects"""
+    os.makedirs(directory, exist_ok=True)
+    tables = zip(("students", "courses", "marks"),
+                 (["id", "name", "dob"], ["id", "name", "credits"],
+                  ["student_id", "course_id", "mark"]),
+                 generate_rows(n_students, n_courses, density, seed))
+    for name, header, rows in tables:
+        with open(os.path.join(directory, f"{name}.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic cohort as importable CSV files")
+    parser.add_argument("students", type=int)
+    parser.add_argument("courses", type=int)
+    parser.add_argument("--density", type=float, default=0.3, help="share of courses each student takes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True, help="output directory")
+    args = parser.parse_args()
+    write_csv(args.out, args.students, args.courses, args.density, args.seed)
+
+
+if __name__ == "__main__":
+    main()
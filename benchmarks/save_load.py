@@ -0,0 +1,69 @@
+"""Compare students.dat codecs: save time, load time and file size.
+
+Run from the repository root:
+
+    python benchmarks/save_load.py [--sizes 1000x20 10000x50] [--codecs zlib:1 lzma:6] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from cohort import best_of, make_cohort, use_pw6
+
+use_pw6()
+import datafile  # noqa: E402
+
+
+DEFAULT_SIZES = ["1000x20", "10000x50", "50000x50"]
+DEFAULT_CODECS = ["none", "zlib:1", "zlib:6", "gzip:1", "gzip:6", "gzip:9",
+                  "bz2:9", "lzma:1", "lzma:6"]
+
+
+def run(sizes, codecs, repeats):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "students.dat")
+        for size in sizes:
+            n_students, n_courses = (int(part) for part in size.split("x"))
+            students, courses, marks = make_cohort(n_students, n_courses)
+            data = {'students': students, 'courses': courses, 'marks': marks}
+            for codec in codecs:
+                def save():
+                    # A fresh file each time, as a full snapshot writes, not an append
+                    if os.path.exists(path):
+                        os.remove(path)
+                    datafile.save_sections(path, data, codec)
+
+                save_s = best_of(repeats, save)
+                load_s = best_of(repeats, lambda: datafile.load(path))
+                results.append({
+                    "students": n_students, "courses": n_courses, "marks": len(marks),
+                    "codec": codec, "save_ms": round(save_s * 1000, 2),
+                    "load_ms": round(load_s * 1000, 2), "bytes": os.path.getsize(path),
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="STUDENTSxCOURSES")
+    parser.add_argument("--codecs", nargs="+", default=DEFAULT_CODECS)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.codecs, args.repeats)
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+    print(f"{'cohort':>14} {'marks':>8} {'codec':>8} {'save ms':>9} {'load ms':>9} {'KiB':>9}")
+    for r in results:
+        print(f"{r['students']:>8}x{r['courses']:<5} {r['marks']:>8} {r['codec']:>8} "
+              f"{r['save_ms']:>9.1f} {r['load_ms']:>9.1f} {r['bytes'] / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
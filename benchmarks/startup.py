@@ -0,0 +1,62 @@
+"""Measure pw6 cold-start import time with python -X importtime.
+
+Run from the repository root:
+
+    python benchmarks/startup.py [--runs N] [--target-ms MS]
+
+Exits with status 1 when the median import time of pw6/main.py is above the
+target, or when a module that should load lazily was imported at startup.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+PW6_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pw6")
+STARTUP_TARGET_MS = 60  # median cumulative import time of main, measured 16-30 ms
+LAZY_MODULES = ("numpy", "gzip", "export")  # must not be executed before first use
+STARTUP_CODE = "import main; main.StudentManagementSystem()"
+
+
+def parse_importtime(stderr):
+    """Return {module: cumulative microseconds} from -X importtime output"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative_us)
+    return times
+
+
+def measure_once():
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+                          cwd=PW6_DIR, capture_output=True, text=True, check=True)
+    return parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--target-ms", type=float, default=STARTUP_TARGET_MS)
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    median_ms = statistics.median(run["main"] for run in runs) / 1000
+    eager = sorted({name for run in runs for name in run
+                    if name.split(".")[0] in LAZY_MODULES})
+
+    print(f"main import time: median {median_ms:.1f} ms over {args.runs} runs "
+          f"(target {args.target_ms:.0f} ms)")
+    slowest = sorted(runs[0].items(), key=lambda item: item[1], reverse=True)[1:6]
+    for name, cumulative_us in slowest:
+        print(f"  {name:<30} {cumulative_us / 1000:6.1f} ms")
+    if eager:
+        print("Imported eagerly but should be lazy: " + ", ".join(eager))
+    return 0 if median_ms <= args.target_ms and not eager else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
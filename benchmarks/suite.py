@@ -0,0 +1,188 @@
+"""End-to-end benchmarks of the hot paths in pw4, pw5 and pw6, reported as JSON.
+
+Run from the repository root:
+
+    python benchmarks/suite.py [--sizes 1000x20 10000x50] [--density 0.3] [--out results.json]
+
+Each practical runs in its own subprocess because they share module names
+(main, input, output, domains). Timings are the best of --repeats runs, in ms.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from cohort import VERSIONS, best_of, generate_rows, use_version
+
+
+DEFAULT_SIZES = ["1000x20", "10000x50"]
+
+
+def build(version, rows):
+    """Turn generated rows into the version's own students, courses and marks"""
+    from domains import Student, Course
+
+    student_rows, course_rows, mark_rows = rows
+    students = [Student(*row) for row in student_rows]
+    courses = [Course(*row) for row in course_rows]
+    if version != "pw6":
+        return students, courses, {(sid, cid): mark for sid, cid, mark in mark_rows}
+    from domains import StudentTable, CourseTable, MarkStore
+    marks = MarkStore()
+    for student_id, course_id, mark in mark_rows:
+        marks[(student_id, course_id)] = mark
+    return StudentTable(students), CourseTable(courses), marks
+
+
+def quietly(func):
+    """Run func with stdout discarded, so console views are timed without the terminal"""
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+    return run
+
+
+def storage_benchmarks(version, students, courses, marks, repeats, tmp):
+    """(name, seconds, file bytes) of saving and loading students.dat"""
+    import main
+    if version == "pw5":
+        # zip of students.txt, courses.txt and marks.txt
+        main.DATA_DIR = tmp
+        main.DATA_FILE = os.path.join(tmp, "students.dat")
+        save_s = best_of(repeats, lambda: main.compress_data(students, courses, marks))
+        size = os.path.getsize(main.DATA_FILE)
+        load_s = best_of(repeats, main.decompress_data)
+        return [("save", save_s, size), ("load", load_s, None)]
+    if version == "pw6":
+        # sectioned pickle, compressed with the default codec. Every path goes under tmp:
+        # a pickle-mode save removes MARK_FILE and a load reads it, so the user's own
+        # students.marks must never be in reach
+        main.DATA_DIR = tmp
+        main.DATA_FILE = os.path.join(tmp, "students.dat")
+        main.MARK_FILE = os.path.join(tmp, "students.marks")
+        main.MARK_FORMAT = "pickle"
+
+        def save():
+            if os.path.exists(main.DATA_FILE):
+                os.remove(main.DATA_FILE)
+            main.save_data_pickle(students, courses, marks)
+
+        save_s = best_of(repeats, save)
+        size = os.path.getsize(main.DATA_FILE)
+        load_s = best_of(repeats, lambda: main.load_data_pickle()[2].coo())
+        results = [("save", save_s, size), ("load", load_s, None)]
+
+        # marks in students.marks, memory-mapped on load; "open" is what startup pays
+        main.MARK_FORMAT = "mmap"
+        save_s = best_of(repeats, lambda: main.save_data_pickle(students, courses, marks,
+                                                                 sections=("marks",)))
+        size = os.path.getsize(main.MARK_FILE)
+        open_s = best_of(repeats, main.load_data_pickle)
+        load_s = best_of(repeats, lambda: main.load_data_pickle()[2].coo())
+        return results + [("save_mmap", save_s, size), ("open_mmap", open_s, None),
+                          ("load_mmap", load_s, None)]
+    return []  # pw4 keeps everything in memory
+
+
+def gpa_benchmarks(version, students, courses, marks, repeats):
+    """(name, seconds, None) of the GPA paths"""
+    import output
+    results = [
+        ("calculate_gpa", best_of(repeats, lambda: [output.calculate_gpa(student, courses, marks)
+                                                    for student in students]), None),
+        ("sort_students_by_gpa", best_of(repeats, quietly(
+            lambda: output.sort_students_by_gpa(None, students, courses, marks))), None),
+    ]
+    if version == "pw6":
+        from domains import GPACache
+        results.append(("calculate_gpas", best_of(
+            repeats, lambda: output.calculate_gpas(students, courses, marks)), None))
+        cache = GPACache()
+        cache.ranking(students, courses, marks)  # what the menu pays once, before the first view
+        results.append(("sort_students_by_gpa_cached", best_of(repeats, quietly(
+            lambda: output.sort_students_by_gpa(None, students, courses, marks, cache))), None))
+    return results
+
+
+def run_worker(version, size, density, seed, repeats):
+    """Time every hot path of one version on one cohort and print the results as JSON"""
+    use_version(version)
+    n_students, n_courses = (int(part) for part in size.split("x"))
+    rows = generate_rows(n_students, n_courses, density, seed)
+    import output  # noqa: F401  pays for NumPy before anything is timed
+    start = time.perf_counter()
+    students, courses, marks = build(version, rows)
+    build_s = time.perf_counter() - start
+    cohort = {"version": version, "students": n_students, "courses": n_courses,
+              "marks": len(rows[2]), "density": density}
+    with tempfile.TemporaryDirectory() as tmp:
+        timings = [("build", build_s, None)]
+        timings += storage_benchmarks(version, students, courses, marks, repeats, tmp)
+        timings += gpa_benchmarks(version, students, courses, marks, repeats)
+    results = [dict(cohort, op=name, ms=round(seconds * 1000, 3),
+                    **({"bytes": size} if size is not None else {}))
+               for name, seconds, size in timings]
+    json.dump(results, sys.stdout)
+
+
+def environment():
+    info = {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count()}
+    try:
+        import numpy
+        info["numpy"] = numpy.__version__
+    except ImportError:
+        pass
+    try:
+        info["commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                        capture_output=True, text=True, check=True,
+                                        cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="STUDENTSxCOURSES")
+    parser.add_argument("--versions", nargs="+", choices=VERSIONS, default=list(VERSIONS))
+    parser.add_argument("--density", type=float, default=0.3, help="share of courses each student takes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--worker", choices=VERSIONS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.sizes[0], args.density, args.seed, args.repeats)
+        return
+
+    results = []
+    for size in args.sizes:
+        for version in args.versions:
+            print(f"{version} {size}...", file=sys.stderr)
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", version,
+                                   "--sizes", size, "--density", str(args.density),
+                                   "--seed", str(args.seed), "--repeats", str(args.repeats)],
+                                  capture_output=True, text=True)
+            if proc.returncode:
+                sys.exit(f"{version} {size} failed:\n{proc.stderr}")
+            results.extend(json.loads(proc.stdout))
+    report = {"environment": environment(), "results": results}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
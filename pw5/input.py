@@ -4,6 +4,10 @@ from domains import Student, Course
 
 
 DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPACT_RATIO = 2  # rewrite marks.txt once it holds this many lines per live mark
+
+# Lines in marks.txt since it was last rewritten in full, superseded ones included
+_marks_lines = None
 
 
 def get_positive_int(prompt, stdscr=None, output_module=None, y=5):
@@ -30,28 +34,60 @@ def get_positive_int(prompt, stdscr=None, output_module=None, y=5):
                 print("Invalid input")
 
 
+def write_students(f, students):
+    """Write one id,name,dob line per student to an open text file"""
+    f.writelines(f"{student.id},{student.name},{student.dob}\n" for student in students)
+
+
+def write_courses(f, courses):
+    """Write one id,name,credits line per course to an open text file"""
+    f.writelines(f"{course.course_id},{course.course_name},{course.credits}\n" for course in courses)
+
+
+def write_marks(f, marks):
+    """Write one student_id,course_id,mark line per mark to an open text file"""
+    f.writelines(f"{student_id},{course_id},{mark}\n" for (student_id, course_id), mark in marks.items())
+
+
 def save_students_to_file(students):
     """Write student info to students.txt"""
     filepath = os.path.join(DATA_DIR, "students.txt")
     with open(filepath, 'w') as f:
-        for student in students:
-            f.write(f"{student.id},{student.name},{student.dob}\n")
+        write_students(f, students)
 
 
 def save_courses_to_file(courses):
     """Write course info to courses.txt"""
     filepath = os.path.join(DATA_DIR, "courses.txt")
     with open(filepath, 'w') as f:
-        for course in courses:
-            f.write(f"{course.course_id},{course.course_name},{course.credits}\n")
+        write_courses(f, courses)
 
 
 def save_marks_to_file(marks):
     """Write marks to marks.txt"""
+    global _marks_lines
     filepath = os.path.join(DATA_DIR, "marks.txt")
     with open(filepath, 'w') as f:
-        for (student_id, course_id), mark in marks.items():
-            f.write(f"{student_id},{course_id},{mark}\n")
+        write_marks(f, marks)
+    _marks_lines = len(marks)
+
+
+def append_marks_to_file(marks, keys):
+    """Append the marks under keys to marks.txt; a later line for a key supersedes earlier ones
+
+    The file is compacted, i.e. rewritten without superseded lines, when it would
+    otherwise grow past COMPACT_RATIO lines per mark.
+    """
+    global _marks_lines
+    filepath = os.path.join(DATA_DIR, "marks.txt")
+    if (_marks_lines is None or not os.path.exists(filepath)
+            or _marks_lines + len(keys) > COMPACT_RATIO * len(marks)):
+        # Unknown contents (e.g. left by another session) or too many stale lines
+        save_marks_to_file(marks)
+        return
+    with open(filepath, 'a') as f:
+        write_marks(f, {key: marks[key] for key in keys})
+    _marks_lines += len(keys)
 
 
 def input_students(students, stdscr=None, output_module=None):
@@ -148,6 +184,7 @@ def input_marks(students, courses, marks, stdscr=None, output_module=None):
         stdscr.refresh()
 
         y = 8
+        keys = []
         for student in students:
             while True:
                 try:
@@ -156,6 +193,7 @@ def input_marks(students, courses, marks, stdscr=None, output_module=None):
                     if 0 <= mark <= 20:
                         mark = math.floor(mark * 10) / 10
                         marks[(student.id, course.course_id)] = mark
+                        keys.append((student.id, course.course_id))
                         y += 3
                         break
                     output_module.draw_status_bar(stdscr, "Enter 0-20. Press any key...")
@@ -164,7 +202,7 @@ def input_marks(students, courses, marks, stdscr=None, output_module=None):
                     output_module.draw_status_bar(stdscr, "Invalid input. Press any key...")
                     stdscr.getch()
 
-        save_marks_to_file(marks)
+        append_marks_to_file(marks, keys)
         output_module.draw_status_bar(stdscr, f"Marks saved for {course.course_name}. Saved to marks.txt. Press any key...")
         stdscr.getch()
     else:
@@ -181,6 +219,7 @@ def input_marks(students, courses, marks, stdscr=None, output_module=None):
         course = courses[choice - 1]
         print(f"Marks for {course.course_name}:")
 
+        keys = []
         for student in students:
             while True:
                 try:
@@ -188,12 +227,13 @@ def input_marks(students, courses, marks, stdscr=None, output_module=None):
                     if 0 <= mark <= 20:
                         mark = math.floor(mark * 10) / 10
                         marks[(student.id, course.course_id)] = mark
+                        keys.append((student.id, course.course_id))
                         break
                     print("Enter 0-20")
                 except ValueError:
                     print("Invalid input")
 
-        save_marks_to_file(marks)
+        append_marks_to_file(marks, keys)
         print(f"\n {course.course_name} marks saved to marks.txt.")
         for student in students:
             key = (student.id, course.course_id)
@@ -1,6 +1,8 @@
 import curses
+import io
 import os
 import pickle
+import time
 import zipfile
 from curses import wrapper
 
@@ -13,25 +15,49 @@ DATA_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_FILE = os.path.join(DATA_DIR, "students.dat")
 
 
-def compress_data():
-    """Compress students.txt, courses.txt, marks.txt into students.dat using ZIP"""
-    files_to_compress = ["students.txt", "courses.txt", "marks.txt"]
-    existing_files = []
+# Archive member, input writer, line parser
+MEMBERS = (
+    ("students.txt", input_module.write_students,
+     lambda parts: Student(parts[0], parts[1], parts[2])),
+    ("courses.txt", input_module.write_courses,
+     lambda parts: Course(parts[0], parts[1], int(parts[2]))),
+    ("marks.txt", input_module.write_marks,
+     lambda parts: ((parts[0], parts[1]), float(parts[2]))),
+)
 
-    for filename in files_to_compress:
+
+def compress_data(students, courses, marks):
+    """Write students, courses and marks straight into students.dat as ZIP members"""
+    if not any((students, courses, marks)):
+        return False
+
+    with zipfile.ZipFile(DATA_FILE, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for (filename, write, _), records in zip(MEMBERS, (students, courses, marks)):
+            if records:
+                # Lines are deflated as they are written; nothing is staged on disk. The
+                # ZipInfo dates the member now, as zipf.write did with the txt file's mtime
+                info = zipfile.ZipInfo(filename, time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with zipf.open(info, 'w') as member, \
+                        io.TextIOWrapper(member, encoding='utf-8') as f:
+                    write(f, records)
+    # The input screens also save txt files as they go; the archive supersedes them
+    for filename, _, _ in MEMBERS:
         filepath = os.path.join(DATA_DIR, filename)
         if os.path.exists(filepath):
-            existing_files.append((filepath, filename))
-
-    if existing_files:
-        with zipfile.ZipFile(DATA_FILE, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for filepath, filename in existing_files:
-                zipf.write(filepath, filename)
-        # Remove original txt files after compression
-        for filepath, _ in existing_files:
             os.remove(filepath)
-        return True
-    return False
+    return True
+
+
+def read_member(zipf, filename, parse):
+    """Parse each line of one archive member as it is decompressed"""
+    with zipf.open(filename) as member:
+        for line in io.TextIOWrapper(member, encoding='utf-8'):
+            line = line.strip()
+            if line:
+                parts = line.split(',')
+                if len(parts) >= 3:
+                    yield parse(parts)
 
 
 def decompress_data():
@@ -45,40 +71,11 @@ def decompress_data():
 
     try:
         with zipfile.ZipFile(DATA_FILE, 'r') as zipf:
-            zipf.extractall(DATA_DIR)
-
-        # Load students
-        students_file = os.path.join(DATA_DIR, "students.txt")
-        if os.path.exists(students_file):
-            with open(students_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line:
-                        parts = line.split(',')
-                        if len(parts) >= 3:
-                            students.append(Student(parts[0], parts[1], parts[2]))
-
-        # Load courses
-        courses_file = os.path.join(DATA_DIR, "courses.txt")
-        if os.path.exists(courses_file):
-            with open(courses_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line:
-                        parts = line.split(',')
-                        if len(parts) >= 3:
-                            courses.append(Course(parts[0], parts[1], int(parts[2])))
-
-        # Load marks
-        marks_file = os.path.join(DATA_DIR, "marks.txt")
-        if os.path.exists(marks_file):
-            with open(marks_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line:
-                        parts = line.split(',')
-                        if len(parts) >= 3:
-                            marks[(parts[0], parts[1])] = float(parts[2])
+            names = set(zipf.namelist())
+            for (filename, _, parse), records in zip(MEMBERS, (students, courses, marks)):
+                if filename in names:
+                    add = records.update if isinstance(records, dict) else records.extend
+                    add(read_member(zipf, filename, parse))
     except Exception as e:
         print(f"Error loading data: {e}")
 
@@ -102,16 +99,8 @@ class StudentManagementSystem:
         return False
 
     def save_data(self):
-        """Compress all data files into students.dat"""
-        # Save current data to txt files first
-        if self.students:
-            input_module.save_students_to_file(self.students)
-        if self.courses:
-            input_module.save_courses_to_file(self.courses)
-        if self.marks:
-            input_module.save_marks_to_file(self.marks)
-        # Compress into students.dat
-        compress_data()
+        """Compress all data into students.dat"""
+        compress_data(self.students, self.courses, self.marks)
 
     def run_curses(self):
         """Run the system with curses-decorated UI"""
@@ -0,0 +1,149 @@
+import csv
+
+from domains import Student, Course
+from lazy import lazy_import
+
+np = lazy_import('numpy')
+
+
+CHUNK_SIZE = 10000   # rows validated and applied together
+MAX_ERRORS = 100     # bad rows kept for the report; the rest are only counted
+
+# Header row that identifies each kind of file
+HEADERS = {
+    'students': ['id', 'name', 'dob'],
+    'courses': ['id', 'name', 'credits'],
+    'marks': ['student_id', 'course_id', 'mark'],
+}
+
+
+class ImportResult:
+    """Counts and the first MAX_ERRORS bad rows of one import"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.added = 0
+        self.updated = 0
+        self.errors = []
+        self.error_count = 0
+
+    def reject(self, line_no, reason):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line_no, reason))
+
+    def __str__(self):
+        return (f"{self.kind}: {self.added} added, {self.updated} updated, "
+                f"{self.error_count} bad row(s)")
+
+
+def read_chunks(reader):
+    """Yield lists of (line_no, row) of at most CHUNK_SIZE rows"""
+    chunk = []
+    for row in reader:
+        if not any(field.strip() for field in row):
+            continue
+        chunk.append((reader.line_num, row))
+        if len(chunk) >= CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_students(chunks, students, result):
+    """Upsert Student records by id"""
+    for chunk in chunks:
+        for line_no, row in chunk:
+            if len(row) != 3:
+                result.reject(line_no, f"expected 3 fields, got {len(row)}")
+                continue
+            sid, name, dob = (field.strip() for field in row)
+            if not sid:
+                result.reject(line_no, "empty student id")
+                continue
+            # Replaces rather than mutates, so snapshots taken earlier stay consistent
+            if students.upsert(Student(sid, name, dob)):
+                result.added += 1
+            else:
+                result.updated += 1
+
+
+def import_courses(chunks, courses, result):
+    """Upsert Course records by id"""
+    for chunk in chunks:
+        for line_no, row in chunk:
+            if len(row) != 3:
+                result.reject(line_no, f"expected 3 fields, got {len(row)}")
+                continue
+            cid, cname, credits = (field.strip() for field in row)
+            if not cid:
+                result.reject(line_no, "empty course id")
+                continue
+            try:
+                credits = int(credits)
+            except ValueError:
+                result.reject(line_no, f"credits not an integer: {credits!r}")
+                continue
+            if credits <= 0:
+                result.reject(line_no, "credits must be > 0")
+                continue
+            if courses.upsert(Course(cid, cname, credits)):
+                result.added += 1
+            else:
+                result.updated += 1
+
+
+def import_marks(chunks, students, courses, marks, result):
+    """Upsert marks, rounding each chunk down to one decimal like input_marks"""
+    for chunk in chunks:
+        keys, values = [], []
+        for line_no, row in chunk:
+            if len(row) != 3:
+                result.reject(line_no, f"expected 3 fields, got {len(row)}")
+                continue
+            sid, cid, mark = (field.strip() for field in row)
+            if students.position(sid) is None:
+                result.reject(line_no, f"unknown student id {sid!r}")
+                continue
+            if courses.position(cid) is None:
+                result.reject(line_no, f"unknown course id {cid!r}")
+                continue
+            try:
+                mark = float(mark)
+            except ValueError:
+                result.reject(line_no, f"mark not a number: {mark!r}")
+                continue
+            if not 0 <= mark <= 20:
+                result.reject(line_no, "mark must be 0-20")
+                continue
+            keys.append((sid, cid))
+            values.append(mark)
+        # Same rounding as math.floor(mark * 10) / 10, done for the whole chunk at once
+        rounded = np.floor(np.array(values, dtype=float) * 10) / 10
+        for key, mark in zip(keys, rounded.tolist()):
+            if key in marks:
+                result.updated += 1
+            else:
+                result.added += 1
+            marks[key] = mark
+
+
+def import_csv(path, students, courses, marks):
+    """Stream a students, courses or marks CSV into the collections, chosen by its header row"""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = [field.strip().lower() for field in next(reader, [])]
+        kind = next((k for k, columns in HEADERS.items() if columns == header), None)
+        if kind is None:
+            raise ValueError(f"Unrecognised header {header}; expected one of "
+                             + "; ".join(",".join(columns) for columns in HEADERS.values()))
+        result = ImportResult(kind)
+        chunks = read_chunks(reader)
+        if kind == 'students':
+            import_students(chunks, students, result)
+        elif kind == 'courses':
+            import_courses(chunks, courses, result)
+        else:
+            import_marks(chunks, students, courses, marks, result)
+    return result
@@ -0,0 +1,146 @@
+from domains import CourseTable
+from domains.marks import SCALE
+from lazy import lazy_import
+from output import id_positions, mark_coordinates
+
+np = lazy_import('numpy')
+parallel = lazy_import('parallel')
+
+
+MAX_MARK = 20.0
+PASS_MARK = 10.0
+PERCENTILES = (25, 50, 75)
+HISTOGRAM_BINS = 10  # equal-width bins over 0..MAX_MARK, the last one closed
+
+
+class CourseStats:
+    """Mark statistics for every course, as arrays aligned with the courses they were computed for
+
+    Courses without marks have a count of 0 and NaN for everything else.
+    """
+
+    def __init__(self, count, mean, std, percentiles, percentile_values, pass_rate,
+                 histogram, bin_edges):
+        self.count = count
+        self.mean = mean
+        self.std = std
+        self.percentiles = tuple(percentiles)
+        self.percentile_values = percentile_values  # courses x len(percentiles)
+        self.pass_rate = pass_rate
+        self.histogram = histogram  # courses x bins
+        self.bin_edges = bin_edges
+
+    @property
+    def median(self):
+        return self.percentile(50)
+
+    def percentile(self, p):
+        return self.percentile_values[:, self.percentiles.index(p)]
+
+    def row(self, position):
+        """Statistics of one course as a plain dict"""
+        return {
+            'count': int(self.count[position]),
+            'mean': float(self.mean[position]),
+            'median': float(self.median[position]),
+            'std': float(self.std[position]),
+            'percentiles': dict(zip(self.percentiles, self.percentile_values[position].tolist())),
+            'pass_rate': float(self.pass_rate[position]),
+            'histogram': self.histogram[position].tolist(),
+        }
+
+
+def course_statistics(students, courses, marks, percentiles=PERCENTILES, pass_mark=PASS_MARK,
+                      bins=HISTOGRAM_BINS):
+    """Compute CourseStats for every course in one pass over the marks of known students"""
+    percentiles = tuple(sorted(set(percentiles) | {50}))
+    student_index, _ = id_positions(students, 'id')
+    course_index, n_courses = id_positions(courses, 'course_id')
+    _, cols, tenths = mark_coordinates(marks, student_index, course_index, tenths=True)
+
+    if parallel.use_parallel(len(tenths)):
+        # Shard the counting of each course's tenths over processes
+        levels = parallel.course_levels(cols, tenths, n_courses)
+        stats = _stats_from_levels(levels, percentiles, pass_mark, bins)
+    else:
+        stats = _stats_from_marks(cols, tenths / SCALE, n_courses, percentiles, pass_mark, bins)
+    if not (isinstance(courses, CourseTable) and not courses.has_duplicates):
+        # Rows are per distinct id; give duplicate courses the statistics of their id
+        order = np.array([course_index[course.course_id] for course in courses], dtype=np.intp)
+        stats = CourseStats(stats.count[order], stats.mean[order], stats.std[order], percentiles,
+                            stats.percentile_values[order], stats.pass_rate[order],
+                            stats.histogram[order], stats.bin_edges)
+    return stats
+
+
+def _ranks(count, percentiles):
+    """Lower and upper 0-based ranks and the weight between them for each percentile,
+    using linear interpolation between closest ranks as np.percentile does by default"""
+    rank = (np.maximum(count, 1) - 1)[:, None] * (np.array(percentiles) / 100.0)
+    lower = np.floor(rank).astype(np.intp)
+    upper = np.minimum(lower + 1, np.maximum(count, 1)[:, None] - 1)
+    return lower, upper, rank - lower
+
+
+def _stats_from_marks(cols, values, n_courses, percentiles, pass_mark, bins):
+    count = np.bincount(cols, minlength=n_courses)
+    has_marks = count > 0
+    safe_count = np.maximum(count, 1)
+    mean = np.where(has_marks, np.bincount(cols, weights=values, minlength=n_courses) / safe_count,
+                    np.nan)
+    deviation = values - mean[cols]
+    std = np.where(has_marks, np.sqrt(np.bincount(cols, weights=deviation * deviation,
+                                                  minlength=n_courses) / safe_count), np.nan)
+    pass_rate = np.where(has_marks, np.bincount(cols, weights=values >= pass_mark,
+                                                minlength=n_courses) / safe_count, np.nan)
+
+    # Sorting course * span + mark puts every course's marks next to each other in
+    # ascending order; subtracting the course offset again recovers the marks
+    low = values.min() if len(values) else 0.0
+    span = (values.max() - low + 1.0) if len(values) else 1.0
+    ordered = np.sort(cols * span + (values - low))
+    ordered -= np.repeat(np.arange(n_courses) * span, count) - low
+    starts = np.cumsum(count) - count
+    lower, upper, weight = _ranks(count, percentiles)
+    if len(ordered):
+        lower_values = ordered[np.minimum(starts[:, None] + lower, len(ordered) - 1)]
+        upper_values = ordered[np.minimum(starts[:, None] + upper, len(ordered) - 1)]
+        percentile_values = lower_values + weight * (upper_values - lower_values)
+    else:
+        percentile_values = np.zeros((n_courses, len(percentiles)))
+    percentile_values[~has_marks] = np.nan
+
+    bin_edges = np.linspace(0.0, MAX_MARK, bins + 1)
+    bin_of = np.clip((values * (bins / MAX_MARK)).astype(np.intp), 0, bins - 1)
+    histogram = np.bincount(cols * bins + bin_of, minlength=n_courses * bins).reshape(n_courses, bins)
+    return CourseStats(count, mean, std, percentiles, percentile_values, pass_rate, histogram,
+                       bin_edges)
+
+
+def _stats_from_levels(levels, percentiles, pass_mark, bins):
+    """The same statistics read off per-course counts of each mark in tenths"""
+    level_marks = np.arange(levels.shape[1]) / SCALE
+    count = levels.sum(axis=1)
+    has_marks = count > 0
+    safe_count = np.maximum(count, 1)
+    mean = np.where(has_marks, levels @ level_marks / safe_count, np.nan)
+    variance = np.maximum(levels @ (level_marks * level_marks) / safe_count - mean * mean, 0.0)
+    std = np.where(has_marks, np.sqrt(variance), np.nan)
+    pass_rate = np.where(has_marks, levels[:, level_marks >= pass_mark].sum(axis=1) / safe_count,
+                         np.nan)
+
+    # The k-th smallest mark is the first level whose running count passes k
+    running = np.cumsum(levels, axis=1)
+    lower, upper, weight = _ranks(count, percentiles)
+    lower_values = level_marks[np.minimum((running[:, :, None] <= lower[:, None, :]).sum(axis=1),
+                                          len(level_marks) - 1)]
+    upper_values = level_marks[np.minimum((running[:, :, None] <= upper[:, None, :]).sum(axis=1),
+                                          len(level_marks) - 1)]
+    percentile_values = lower_values + weight * (upper_values - lower_values)
+    percentile_values[~has_marks] = np.nan
+
+    bin_edges = np.linspace(0.0, MAX_MARK, bins + 1)
+    bin_of = np.clip((level_marks * (bins / MAX_MARK)).astype(np.intp), 0, bins - 1)
+    histogram = levels @ (bin_of[:, None] == np.arange(bins)).astype(levels.dtype)
+    return CourseStats(count, mean, std, percentiles, percentile_values, pass_rate, histogram,
+                       bin_edges)
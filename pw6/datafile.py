@@ -0,0 +1,375 @@
+import os
+import struct
+import zlib
+
+from lazy import lazy_import
+
+# Only needed once something is loaded or saved, so they stay out of startup
+pickle = lazy_import('pickle')
+tempfile = lazy_import('tempfile')
+threading = lazy_import('threading')
+
+
+# students.dat written before sections: MAGIC, a codec id and its level, then one payload
+MAGIC = b'SMSD'
+HEADER_SIZE = len(MAGIC) + 2
+GZIP_MAGIC = b'\x1f\x8b'  # files written before the header existed
+
+# Sectioned students.dat: SECTIONED_MAGIC, then compressed sections, then an index of
+# {section: (offset, length, codec id, level, segments, crc32)} and a trailer. Saving a few
+# sections appends them plus a new index, so clean sections are never rewritten. The crc32
+# covers a section's stream and segments; an index whose sections do not match it is skipped
+# for the one before it.
+SECTIONED_MAGIC = b'SMSS'
+TRAILER = struct.Struct('<QI4s')  # index length, crc32 of the index, TRAILER_MAGIC
+TRAILER_MAGIC = b'SMSI'
+REWRITE_RATIO = 2  # rewrite the whole file once it is this many times the live sections
+# A section is pickled with protocol 5: large buffers such as the mark arrays are kept out
+# of the pickle stream and stored after it as segments, ((offset, length), ...). Each starts
+# on a SEGMENT_ALIGN boundary and is only compressed if the codec is not 'none'.
+PICKLE_PROTOCOL = 5
+SEGMENT_ALIGN = 64
+CRC_CHUNK = 1 << 20  # bytes read at a time while checking a section's crc32
+
+# name -> (id, default level, compression module)
+CODECS = {
+    'none': (0, 0, None),
+    'zlib': (1, 6, 'zlib'),
+    'gzip': (2, 9, 'gzip'),
+    'bz2': (3, 9, 'bz2'),
+    'lzma': (4, 6, 'lzma'),
+}
+CODEC_NAMES = {codec_id: name for name, (codec_id, _, _) in CODECS.items()}
+
+# Fast enough for frequent autosaves; override with e.g. SMS_CODEC=lzma:6
+DEFAULT_CODEC = os.environ.get("SMS_CODEC", "zlib:1")
+
+
+def parse_codec(spec):
+    """Turn 'name' or 'name:level' into (name, level)"""
+    name, _, level = spec.partition(':')
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec {name!r}; expected one of {', '.join(CODECS)}")
+    return name, int(level) if level else CODECS[name][1]
+
+
+def compress(raw, name, level):
+    if name == 'none':
+        return raw
+    module = lazy_import(CODECS[name][2])
+    if name == 'lzma':
+        return module.compress(raw, preset=level)
+    return module.compress(raw, level)
+
+
+def decompress(payload, name):
+    if name == 'none':
+        return payload
+    return lazy_import(CODECS[name][2]).decompress(payload)
+
+
+def _read_umask():
+    # os.umask can only be read by setting it, so do it once here rather than from the saver thread
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+UMASK = _read_umask()
+
+
+def write_atomic(path, chunks):
+    """Write chunks to a temp file next to path, fsync it, then swap it in with os.replace
+
+    The file keeps the mode of the one it replaces, or gets the usual 0o666 & ~umask when new;
+    mkstemp alone would leave it readable by its owner only.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~UMASK
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    # A crash right after the rename must not bring the old directory entry back
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def read_header(f):
+    """Return (codec name, level) of an open data file, leaving it positioned at the payload"""
+    header = f.read(HEADER_SIZE)
+    if header[:len(MAGIC)] == MAGIC:
+        return CODEC_NAMES[header[len(MAGIC)]], header[len(MAGIC) + 1]
+    if header[:len(GZIP_MAGIC)] == GZIP_MAGIC:
+        f.seek(0)
+        return 'gzip', None
+    raise ValueError("Not a students.dat file")
+
+
+def _parse_index(raw, trailer, start):
+    """Return the index in raw if trailer vouches for it and it starts after the magic"""
+    length, crc, magic = TRAILER.unpack(trailer)
+    if (magic != TRAILER_MAGIC or length != len(raw) or start < len(SECTIONED_MAGIC)
+            or zlib.crc32(raw) != crc):
+        return None
+    return pickle.loads(raw)
+
+
+def read_index(f):
+    """Return (index, offset just past its trailer) for a sectioned file, None for older formats"""
+    f.seek(0)
+    if f.read(len(SECTIONED_MAGIC)) != SECTIONED_MAGIC:
+        return None
+    size = f.seek(0, os.SEEK_END)
+    if size >= len(SECTIONED_MAGIC) + TRAILER.size:
+        f.seek(size - TRAILER.size)
+        trailer = f.read(TRAILER.size)
+        length = TRAILER.unpack(trailer)[0]
+        start = size - TRAILER.size - length
+        if start >= 0:
+            f.seek(start)
+            index = _parse_index(f.read(length), trailer, start)
+            if index is not None and _sections_intact(f, index):
+                return index, size
+    # A crash mid-append leaves a torn tail or an index whose sections never reached the
+    # disk; fall back to the last complete index
+    f.seek(0)
+    data = f.read()
+    pos = len(data)
+    while True:
+        pos = data.rfind(TRAILER_MAGIC, 0, pos)
+        if pos < 0:
+            raise ValueError("students.dat has no readable section index")
+        end = pos + len(TRAILER_MAGIC)
+        trailer_start = end - TRAILER.size
+        if trailer_start < 0:
+            continue
+        trailer = data[trailer_start:end]
+        start = trailer_start - TRAILER.unpack(trailer)[0]
+        if start >= 0:
+            index = _parse_index(data[start:trailer_start], trailer, start)
+            if index is not None and _sections_intact(f, index):
+                return index, end
+
+
+def _segments(entry):
+    # Entries written before out-of-band buffers have no segments
+    return entry[4] if len(entry) > 4 else ()
+
+
+def _stored_size(entry):
+    return entry[1] + sum(length for _, length in _segments(entry))
+
+
+def _sections_intact(f, index):
+    """Return True if every section in index matches the crc32 stored with it"""
+    for entry in index.values():
+        if len(entry) < 6:
+            continue  # written before sections had checksums
+        crc = 0
+        for offset, length in ((entry[0], entry[1]),) + tuple(_segments(entry)):
+            f.seek(offset)
+            remaining = length
+            while remaining:
+                chunk = f.read(min(remaining, CRC_CHUNK))
+                if not chunk:
+                    return False
+                crc = zlib.crc32(chunk, crc)
+                remaining -= len(chunk)
+        if crc != entry[5]:
+            return False
+    return True
+
+
+def _load_section(f, entry):
+    """Unpickle one section, handing its segments to pickle as out-of-band buffers"""
+    offset, length, codec_id = entry[:3]
+    name = CODEC_NAMES[codec_id]
+    f.seek(offset)
+    stream = decompress(f.read(length), name)
+    buffers = []
+    for segment_offset, segment_length in _segments(entry):
+        f.seek(segment_offset)
+        if name == 'none':
+            # Read straight into the memory the unpickled arrays will use
+            buffer = bytearray(segment_length)
+            if f.readinto(buffer) != segment_length:
+                raise ValueError("students.dat ends inside a section")
+        else:
+            buffer = decompress(f.read(segment_length), name)
+        buffers.append(buffer)
+    return pickle.loads(stream, buffers=buffers)
+
+
+def _pack(obj, name, level):
+    """(compressed pickle stream, segments) of obj"""
+    buffers = []
+    stream = pickle.dumps(obj, protocol=PICKLE_PROTOCOL, buffer_callback=buffers.append)
+    return compress(stream, name, level), [compress(buffer.raw(), name, level) for buffer in buffers]
+
+
+def _place(offset, stream, segments, codec_id, level):
+    """(index entry, chunks to write, offset after them) for a section written at offset"""
+    entry_offset = offset
+    chunks = [stream]
+    offset += len(stream)
+    crc = zlib.crc32(stream)
+    placed = []
+    for segment in segments:
+        padding = -offset % SEGMENT_ALIGN
+        size = memoryview(segment).nbytes
+        chunks += [bytes(padding), segment]
+        placed.append((offset + padding, size))
+        offset += padding + size
+        crc = zlib.crc32(segment, crc)
+    return (entry_offset, len(stream), codec_id, level, tuple(placed), crc), chunks, offset
+
+
+def save_sections(path, sections, codec=DEFAULT_CODEC):
+    """Pickle each {name: object} into its own section of path, keeping the other sections as they are
+
+    path must already be sectioned unless sections holds everything the file should contain.
+    """
+    name, level = parse_codec(codec)
+    codec_id = CODECS[name][0]
+    packed = {section: _pack(obj, name, level) for section, obj in sections.items()}
+    new_size = sum(len(stream) + sum(memoryview(segment).nbytes for segment in segments)
+                   for stream, segments in packed.values())
+    found = None
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            found = read_index(f)
+    if found is None:
+        _rewrite(path, {}, packed, codec_id, level)
+        return
+    index, end = found
+    kept = {section: entry for section, entry in index.items() if section not in packed}
+    live = sum(map(_stored_size, kept.values())) + new_size
+    if end + new_size > REWRITE_RATIO * live:
+        _rewrite(path, kept, packed, codec_id, level)
+        return
+    # Append after the last good index; the old index stays intact until the new one is synced
+    with open(path, 'r+b') as f:
+        f.seek(end)
+        offset = end
+        index = dict(kept)
+        for section, (stream, segments) in packed.items():
+            index[section], chunks, offset = _place(offset, stream, segments, codec_id, level)
+            for chunk in chunks:
+                f.write(chunk)
+        # The sections must be on disk before an index that points at them can be
+        f.flush()
+        os.fsync(f.fileno())
+        f.write(_index_bytes(index))
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _index_bytes(index):
+    raw = pickle.dumps(index)
+    return raw + TRAILER.pack(len(raw), zlib.crc32(raw), TRAILER_MAGIC)
+
+
+def _rewrite(path, kept, packed, codec_id, level):
+    """Write a compact sectioned file: kept sections copied raw from path, then the new ones"""
+    chunks = [SECTIONED_MAGIC]
+    offset = len(SECTIONED_MAGIC)
+    index = {}
+    if kept:
+        with open(path, 'rb') as f:
+            for section, entry in kept.items():
+                f.seek(entry[0])
+                stream = f.read(entry[1])
+                segments = []
+                for segment_offset, segment_length in _segments(entry):
+                    f.seek(segment_offset)
+                    segments.append(f.read(segment_length))
+                index[section], placed, offset = _place(offset, stream, segments, entry[2], entry[3])
+                chunks += placed
+    for section, (stream, segments) in packed.items():
+        index[section], placed, offset = _place(offset, stream, segments, codec_id, level)
+        chunks += placed
+    chunks.append(_index_bytes(index))
+    write_atomic(path, chunks)
+
+
+def load(path, sections=None):
+    """Unpickle the data in path, detecting a sectioned file or the codec from its header
+
+    Only the named sections of a sectioned file are read; older formats are read whole.
+    """
+    with open(path, 'rb') as f:
+        found = read_index(f)
+        if found is not None:
+            return {section: _load_section(f, entry)
+                    for section, entry in found[0].items()
+                    if sections is None or section in sections}
+        f.seek(0)
+        name, _ = read_header(f)
+        payload = f.read()
+    return pickle.loads(decompress(payload, name))
+
+
+def is_sectioned(path):
+    """Return True if path exists and is a sectioned file that single sections can be saved into"""
+    if not os.path.exists(path):
+        return False
+    with open(path, 'rb') as f:
+        return f.read(len(SECTIONED_MAGIC)) == SECTIONED_MAGIC
+
+
+class BackgroundSaver:
+    """Runs save_sections() on a worker thread so the UI never waits for serialization"""
+
+    def __init__(self, save_sections=save_sections):
+        # Called as save_sections(path, sections, codec); swapped out to route sections elsewhere
+        self.save_sections = save_sections
+        self._thread = None
+        self.error = None
+
+    @property
+    def busy(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def save(self, sections, path, codec=DEFAULT_CODEC, on_done=None):
+        """Start writing sections, which must not be mutated afterwards; on_done runs after success"""
+        self.wait()
+        # Load the lazy pickle module here: before Python 3.12 a lazy module is not safe to
+        # load from two threads at once, and the UI may be writing journal entries meanwhile
+        pickle.PickleBuffer
+
+        def work():
+            try:
+                self.save_sections(path, sections, codec)
+            except Exception as e:
+                self.error = e
+                return
+            self.error = None
+            if on_done:
+                on_done()
+
+        self._thread = threading.Thread(target=work, name="students.dat saver")
+        self._thread.start()
+
+    def wait(self):
+        """Block until the save in progress, if any, is on disk"""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -1,4 +1,9 @@
 from .student import Student
 from .course import Course
+from .marks import MarkStore
+from .gpa_cache import GPACache
+from .rank_index import RankIndex
+from .tables import StudentTable, CourseTable, StudentView, CourseView
 
-__all__ = ['Student', 'Course']
+__all__ = ['Student', 'Course', 'MarkStore', 'GPACache', 'RankIndex',
+           'StudentTable', 'CourseTable', 'StudentView', 'CourseView']
@@ -1,6 +1,17 @@
 class Course:
+    __slots__ = ('course_id', 'course_name', 'credits')
+
     def __init__(self, course_id, course_name, credits=3):
         self.course_id, self.course_name, self.credits = course_id, course_name, credits
 
     def __str__(self):
         return f"ID: {self.course_id}, Name: {self.course_name}, Credits: {self.credits}"
+
+    def __reduce__(self):
+        return Course, (self.course_id, self.course_name, self.credits)
+
+    def __setstate__(self, state):
+        # Records pickled before __slots__ carry their __dict__
+        self.course_id = state['course_id']
+        self.course_name = state['course_name']
+        self.credits = state['credits']
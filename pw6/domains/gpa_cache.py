@@ -0,0 +1,87 @@
+from lazy import lazy_import
+
+from .marks import MarkStore, SCALE, to_tenths
+from .rank_index import RankIndex
+
+np = lazy_import('numpy')
+parallel = lazy_import('parallel')
+
+
+class GPACache:
+    """Running credit-weighted mark sum and credit total for every student
+
+    Sums are kept as integers, in tenths of a mark times credits, so any number of
+    updates adds up to exactly what a rebuild would compute.
+    """
+
+    def __init__(self):
+        self.credits = {}
+        self.weighted_sums = {}
+        self.total_credits = {}
+        self.rank_index = RankIndex()
+        self.valid = False
+
+    def invalidate(self):
+        """Drop the cached sums, e.g. after courses or credits change"""
+        self.valid = False
+        self.rank_index.invalidate()
+
+    def rebuild(self, courses, marks):
+        """Recompute every student's sums from scratch"""
+        self.credits = {}
+        for course in courses:
+            # Duplicate course ids each count the mark once, so their credits add up
+            self.credits[course.course_id] = self.credits.get(course.course_id, 0) + course.credits
+        self.weighted_sums, self.total_credits = {}, {}
+        if isinstance(marks, MarkStore):
+            rows, cols, tenths = marks.coo_tenths()
+            credit_vector = np.array([self.credits.get(cid, 0) for cid in marks.course_ids], dtype=float)
+            weighted, totals = parallel.student_sums(rows, cols, tenths, credit_vector,
+                                                     len(marks.student_ids))
+            self.weighted_sums = dict(zip(marks.student_ids, weighted.astype(np.int64).tolist()))
+            self.total_credits = dict(zip(marks.student_ids, totals.astype(np.int64).tolist()))
+        elif hasattr(marks, 'student_sums'):
+            # Backends that can aggregate themselves, e.g. SQLiteMarkStore
+            for student_id, weighted, total in marks.student_sums():
+                self.weighted_sums[student_id] = round(weighted * SCALE)
+                self.total_credits[student_id] = total
+        else:
+            self.valid = True
+            for (student_id, course_id), mark in marks.items():
+                self.on_mark(student_id, course_id, None, mark)
+        self.valid = True
+
+    def on_mark(self, student_id, course_id, old, new):
+        """Apply one mark change in O(1); old/new are None when the mark is absent"""
+        if not self.valid:
+            return
+        credit = self.credits.get(course_id)
+        if credit is None:
+            return
+        weighted = self.weighted_sums.get(student_id, 0)
+        total = self.total_credits.get(student_id, 0)
+        if old is not None:
+            weighted -= to_tenths(old) * credit
+            total -= credit
+        if new is not None:
+            weighted += to_tenths(new) * credit
+            total += credit
+        self.weighted_sums[student_id] = weighted
+        self.total_credits[student_id] = total
+        self.rank_index.update(student_id, self.gpa(student_id))
+
+    def gpa(self, student_id):
+        total = self.total_credits.get(student_id, 0)
+        return self.weighted_sums[student_id] / (total * SCALE) if total > 0 else 0.0
+
+    def gpas(self, students, courses, marks):
+        """GPAs aligned with students, rebuilding first if the cache was invalidated"""
+        if not self.valid:
+            self.rebuild(courses, marks)
+        return np.array([self.gpa(student.id) for student in students], dtype=float)
+
+    def ranking(self, students, courses, marks, start=0, stop=None):
+        """(student, gpa) pairs for ranks start..stop-1 from the maintained rank index"""
+        if not self.valid or not self.rank_index.valid or self.rank_index.size != len(students):
+            self.rank_index.rebuild(students, self.gpas(students, courses, marks))
+        return [(students[position], gpa) for position, gpa in self.rank_index.window(start, stop)]
@@ -0,0 +1,385 @@
+import copyreg
+import math
+from collections.abc import MutableMapping
+
+from lazy import lazy_import
+
+np = lazy_import('numpy')
+pickle = lazy_import('pickle')  # only for PickleBuffer, once a store is saved
+
+
+DENSE_LIMIT = 1 << 20  # matrix cells before the store switches to CSR
+ARRAY_KEYS = ('indptr', 'indices', 'tenths')  # state entries that hold raw array buffers
+
+# Marks are kept as whole tenths, 0-200, in one byte each; NO_MARK fills empty cells
+SCALE = 10
+MAX_TENTHS = 200
+NO_MARK = 255
+TENTHS_DTYPE = 'u1'
+
+
+def to_tenths(mark):
+    """Whole tenths in a 0-20 mark, rounded down like input_marks"""
+    # The epsilon keeps a mark such as 0.3, i.e. 2.9999... tenths, from losing a tenth
+    tenths = math.floor(float(mark) * SCALE + 1e-9)
+    if not 0 <= tenths <= MAX_TENTHS:
+        raise ValueError(f"mark {mark!r} is not between 0 and 20")
+    return tenths
+
+
+def tenths_array(marks):
+    """to_tenths for a whole array of marks, e.g. ones saved as floats"""
+    tenths = np.floor(np.asarray(marks, dtype=float) * SCALE + 1e-9)
+    if len(tenths) and not (0 <= tenths.min() and tenths.max() <= MAX_TENTHS):
+        raise ValueError("marks must be between 0 and 20")
+    return tenths.astype(TENTHS_DTYPE)
+
+
+class MarkStore(MutableMapping):
+    """Marks keyed by (student_id, course_id), held in a NumPy matrix instead of a dict
+
+    Marks go in and come out as floats but are stored as whole tenths, see to_tenths.
+    """
+
+    def __init__(self, marks=None, dense_limit=DENSE_LIMIT):
+        self.dense_limit = dense_limit
+        self.student_ids, self.course_ids = [], []
+        self.student_index, self.course_index = {}, {}
+        self._count = 0
+        # NumPy is only needed once the first mark is touched, see _thaw
+        self._dense = None
+        self._sparse = False
+        self._frozen = None
+        # CSR arrays once the catalog outgrows dense_limit; new cells wait in _pending
+        self._indptr = self._indices = self._tenths = None
+        self._pending = {}
+        # row -> set of cols and col -> set of rows holding a mark, built on first use
+        self._row_cols = self._col_rows = None
+        # Called as listener(student_id, course_id, old, new) after every write
+        self.listeners = []
+        if marks:
+            self.update(marks)
+
+    @classmethod
+    def from_csr(cls, student_ids, course_ids, indptr, indices, tenths, dense_limit=DENSE_LIMIT):
+        """Store that uses existing CSR arrays as they are, e.g. memory-mapped ones
+
+        tenths must not hold deleted (NO_MARK) cells. The arrays are only replaced once
+        enough new cells are pending to be merged in.
+        """
+        store = cls(dense_limit=dense_limit)
+        store.student_ids, store.course_ids = list(student_ids), list(course_ids)
+        store.student_index = {sid: i for i, sid in enumerate(store.student_ids)}
+        store.course_index = {cid: i for i, cid in enumerate(store.course_ids)}
+        store._count = len(tenths)
+        store._sparse = True
+        store._indptr, store._indices, store._tenths = indptr, indices, tenths
+        return store
+
+    @property
+    def is_sparse(self):
+        return self._sparse
+
+    def _intern(self, ids, index, key):
+        pos = index.get(key)
+        if pos is None:
+            pos = index[key] = len(ids)
+            ids.append(key)
+        return pos
+
+    def _reserve(self):
+        """Grow the dense matrix to fit every known id, or switch to CSR if it would be too big"""
+        self._thaw()
+        rows, cols = len(self.student_ids), len(self.course_ids)
+        cap_rows, cap_cols = self._dense.shape if self._dense is not None else (0, 0)
+        if rows <= cap_rows and cols <= cap_cols:
+            return
+        new_rows = max(rows, cap_rows * 2, 8) if rows > cap_rows else cap_rows
+        new_cols = max(cols, cap_cols * 2, 8) if cols > cap_cols else cap_cols
+        if new_rows * new_cols > self.dense_limit:
+            self._to_sparse()
+            return
+        grown = np.full((new_rows, new_cols), NO_MARK, dtype=TENTHS_DTYPE)
+        if self._dense is not None:
+            grown[:cap_rows, :cap_cols] = self._dense
+        self._dense = grown
+
+    def _find(self, row, col):
+        """Position of (row, col) in the CSR arrays, or -1"""
+        if row >= len(self._indptr) - 1:
+            return -1
+        lo, hi = self._indptr[row], self._indptr[row + 1]
+        pos = lo + int(np.searchsorted(self._indices[lo:hi], col))
+        if pos < hi and self._indices[pos] == col:
+            return pos
+        return -1
+
+    def _lookup(self, row, col):
+        """Tenths stored at (row, col), or NO_MARK"""
+        self._thaw()
+        if not self.is_sparse:
+            if self._dense is None:
+                return NO_MARK
+            if row < self._dense.shape[0] and col < self._dense.shape[1]:
+                return int(self._dense[row, col])
+            return NO_MARK
+        if (row, col) in self._pending:
+            return self._pending[(row, col)]
+        pos = self._find(row, col)
+        return int(self._tenths[pos]) if pos >= 0 else NO_MARK
+
+    def _cell(self, key):
+        student_id, course_id = key
+        row = self.student_index.get(student_id)
+        col = self.course_index.get(course_id)
+        if row is None or col is None:
+            raise KeyError(key)
+        return row, col
+
+    def __getitem__(self, key):
+        tenths = self._lookup(*self._cell(key))
+        if tenths == NO_MARK:
+            raise KeyError(key)
+        return tenths / SCALE
+
+    def __setitem__(self, key, value):
+        student_id, course_id = key
+        tenths = to_tenths(value)
+        row = self._intern(self.student_ids, self.student_index, student_id)
+        col = self._intern(self.course_ids, self.course_index, course_id)
+        if not self.is_sparse:
+            self._reserve()
+        old = self._lookup(row, col)
+        if old == NO_MARK:
+            old = None
+            self._count += 1
+            if self._row_cols is not None:
+                self._row_cols.setdefault(row, set()).add(col)
+                self._col_rows.setdefault(col, set()).add(row)
+        else:
+            old /= SCALE
+        if not self.is_sparse:
+            self._dense[row, col] = tenths
+        else:
+            pos = self._find(row, col)
+            if pos >= 0:
+                self._tenths[pos] = tenths
+            else:
+                self._pending[(row, col)] = tenths
+                if len(self._pending) > max(1024, len(self._tenths) // 4):
+                    self._merge()
+        for listener in self.listeners:
+            listener(student_id, course_id, old, tenths / SCALE)
+
+    def __delitem__(self, key):
+        row, col = self._cell(key)
+        old = self._lookup(row, col)
+        if old == NO_MARK:
+            raise KeyError(key)
+        self._count -= 1
+        if self._row_cols is not None:
+            self._row_cols[row].discard(col)
+            self._col_rows[col].discard(row)
+        if not self.is_sparse:
+            self._dense[row, col] = NO_MARK
+        elif self._pending.pop((row, col), None) is None:
+            self._tenths[self._find(row, col)] = NO_MARK
+        for listener in self.listeners:
+            listener(key[0], key[1], old / SCALE, None)
+
+    def __iter__(self):
+        rows, cols, _ = self.coo_tenths()
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            yield self.student_ids[row], self.course_ids[col]
+
+    def __len__(self):
+        return self._count
+
+    def coo(self):
+        """Return (rows, cols, values) arrays of every stored mark, indexed by student_ids/course_ids"""
+        rows, cols, tenths = self.coo_tenths()
+        return rows, cols, tenths / SCALE
+
+    def coo_tenths(self):
+        """coo() with each mark as its integer number of tenths, for exact sums"""
+        self._thaw()
+        if not self.is_sparse:
+            if self._dense is None:
+                return (np.array([], dtype=np.intp), np.array([], dtype=np.intp),
+                        np.array([], dtype=TENTHS_DTYPE))
+            rows, cols = np.nonzero(self._dense != NO_MARK)
+            return rows, cols, self._dense[rows, cols]
+        if self._pending:
+            self._merge()
+        rows = np.repeat(np.arange(len(self._indptr) - 1), np.diff(self._indptr))
+        keep = self._tenths != NO_MARK
+        return rows[keep], self._indices[keep].astype(np.intp), self._tenths[keep]
+
+    def coo_tenths_chunks(self, size):
+        """coo_tenths() a few whole rows at a time, about size marks per chunk
+
+        Only one chunk's row and column indexes exist at once, instead of ones for every mark.
+        """
+        self._thaw()
+        if not self.is_sparse:
+            # A dense matrix holds at most dense_limit cells anyway
+            yield self.coo_tenths()
+            return
+        if self._pending:
+            self._merge()
+        indptr = self._indptr
+        n_rows = len(indptr) - 1
+        start = 0
+        while start < n_rows:
+            # Last row boundary within size marks of this chunk's start, but at least one row
+            stop = int(np.searchsorted(indptr, indptr[start] + size, side='right')) - 1
+            stop = min(max(stop, start + 1), n_rows)
+            lo, hi = indptr[start], indptr[stop]
+            rows = np.repeat(np.arange(start, stop), np.diff(indptr[start:stop + 1]))
+            tenths = self._tenths[lo:hi]
+            keep = tenths != NO_MARK
+            yield rows[keep], self._indices[lo:hi][keep].astype(np.intp), tenths[keep]
+            start = stop
+
+    def _build_adjacency(self):
+        if self._row_cols is not None:
+            return
+        rows, cols, _ = self.coo_tenths()
+        self._row_cols = self._group(rows, cols)
+        self._col_rows = self._group(cols, rows)
+
+    @staticmethod
+    def _group(keys, members):
+        """{key: set of members} from two parallel arrays, grouped with one sort"""
+        order = np.argsort(keys, kind='stable')
+        keys, members = keys[order], members[order]
+        starts = np.flatnonzero(np.diff(keys)) + 1
+        groups = np.split(members, starts)
+        firsts = keys[np.concatenate([[0], starts])] if len(keys) else []
+        return {int(key): set(group.tolist()) for key, group in zip(firsts, groups)}
+
+    def courses_of(self, student_id):
+        """{course_id: mark} for the courses a student has marks in, in O(courses taken)"""
+        row = self.student_index.get(student_id)
+        if row is None:
+            return {}
+        self._thaw()
+        if self.is_sparse and self._row_cols is None and not self._pending:
+            # The row's slice of the CSR arrays is all there is; this touches no other row
+            if row >= len(self._indptr) - 1:
+                return {}
+            lo, hi = self._indptr[row], self._indptr[row + 1]
+            return {self.course_ids[col]: tenths / SCALE for col, tenths
+                    in zip(self._indices[lo:hi].tolist(), self._tenths[lo:hi].tolist())
+                    if tenths != NO_MARK}
+        self._build_adjacency()
+        return {self.course_ids[col]: self._lookup(row, col) / SCALE
+                for col in sorted(self._row_cols.get(row, ()))}
+
+    def students_of(self, course_id):
+        """{student_id: mark} for the students with a mark in a course, in O(enrolled)"""
+        col = self.course_index.get(course_id)
+        if col is None:
+            return {}
+        self._build_adjacency()
+        return {self.student_ids[row]: self._lookup(row, col) / SCALE
+                for row in sorted(self._col_rows.get(col, ()))}
+
+    def _build_csr(self, rows, cols, tenths):
+        order = np.lexsort((cols, rows))
+        self._indptr = np.zeros(len(self.student_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(self.student_ids)), out=self._indptr[1:])
+        self._indices = np.asarray(cols, dtype=np.int32)[order]
+        self._tenths = np.asarray(tenths, dtype=TENTHS_DTYPE)[order]
+        self._pending = {}
+
+    def _merge(self):
+        """Fold pending writes into the CSR arrays, dropping deleted cells"""
+        rows = np.repeat(np.arange(len(self._indptr) - 1), np.diff(self._indptr))
+        keep = self._tenths != NO_MARK
+        rows, cols, tenths = rows[keep], self._indices[keep], self._tenths[keep]
+        if self._pending:
+            extra = np.array(list(self._pending), dtype=np.int64).reshape(-1, 2)
+            rows = np.concatenate([rows, extra[:, 0]])
+            cols = np.concatenate([cols, extra[:, 1]])
+            tenths = np.concatenate([tenths, np.fromiter(self._pending.values(), TENTHS_DTYPE)])
+        self._build_csr(rows, cols, tenths)
+
+    def _to_sparse(self):
+        rows, cols, tenths = self.coo_tenths()
+        self._dense = None
+        self._sparse = True
+        self._build_csr(rows, cols, tenths)
+
+    def __getstate__(self):
+        # Always as CSR: only the entered marks are stored, whatever the mode. The arrays
+        # are handed over as buffers, never as NumPy objects, so unpickling does not import NumPy.
+        if self._frozen is not None and self._frozen['tenths'] is not None:
+            return self._frozen
+        # coo() lists cells row by row with ascending columns, which is CSR order already
+        rows, cols, tenths = self.coo_tenths()
+        counts = np.bincount(rows, minlength=len(self.student_ids))
+        return {
+            'dense_limit': self.dense_limit,
+            'student_ids': self.student_ids,
+            'course_ids': self.course_ids,
+            'count': len(tenths),
+            'indptr': np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            'indices': cols.astype(np.int32),
+            'tenths': tenths.astype(TENTHS_DTYPE, copy=False),
+        }
+
+    def __reduce_ex__(self, protocol):
+        state = dict(self.__getstate__())
+        for key in ARRAY_KEYS:
+            if protocol >= 5:
+                # Out of band when the pickler has a buffer_callback, e.g. in save_sections
+                state[key] = pickle.PickleBuffer(state[key])
+            else:
+                state[key] = bytes(memoryview(state[key]))
+        return copyreg.__newobj__, (type(self),), state
+
+    def __setstate__(self, state):
+        self.__init__(dense_limit=state['dense_limit'])
+        self.student_ids = list(state['student_ids'])
+        self.course_ids = list(state['course_ids'])
+        self.student_index = {sid: i for i, sid in enumerate(self.student_ids)}
+        self.course_index = {cid: i for i, cid in enumerate(self.course_ids)}
+        self._count = state['count']
+        self._sparse = len(self.student_ids) * len(self.course_ids) > self.dense_limit
+        if 'tenths' not in state:
+            # Saved before marks were kept in tenths, as float64 'data'
+            state = dict(state, tenths=None)
+        self._frozen = dict(state, student_ids=self.student_ids, course_ids=self.course_ids)
+
+    def snapshot(self):
+        """Return an independent, unthawed copy holding the current marks"""
+        clone = MarkStore.__new__(MarkStore)
+        clone.__setstate__(self.__getstate__())
+        return clone
+
+    def _thaw(self):
+        """Build the arrays of an unpickled store on first use"""
+        if self._frozen is None:
+            return
+        state, self._frozen = self._frozen, None
+        indptr = np.frombuffer(state['indptr'], dtype=np.int64)
+        cols = np.frombuffer(state['indices'], dtype=np.int32)
+        if state['tenths'] is None:
+            tenths = tenths_array(np.frombuffer(state['data'], dtype=np.float64))
+        else:
+            tenths = np.frombuffer(state['tenths'], dtype=TENTHS_DTYPE)
+        if self._sparse:
+            # Already in CSR order, so the buffers are used as they are; only tenths is
+            # written in place, and the buffers may be shared with a snapshot
+            self._indptr, self._indices, self._tenths = indptr, cols, tenths.copy()
+            self._pending = {}
+        else:
+            rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+            self._dense = np.full((len(self.student_ids), len(self.course_ids)), NO_MARK,
+                                  dtype=TENTHS_DTYPE)
+            self._dense[rows, cols] = tenths
+
+    def __repr__(self):
+        mode = 'sparse' if self.is_sparse else 'dense'
+        return f"MarkStore({len(self)} marks, {len(self.student_ids)}x{len(self.course_ids)}, {mode})"
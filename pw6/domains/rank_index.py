@@ -0,0 +1,38 @@
+from bisect import bisect_left, insort
+
+
+class RankIndex:
+    """Students kept ordered by GPA so any rank window can be read without sorting"""
+
+    def __init__(self):
+        self._keys = []      # (-gpa, position in students) in rank order
+        self._positions = {}  # student id -> positions in students
+        self._neg_gpas = []   # current key of each position
+        self.size = 0
+        self.valid = False
+
+    def invalidate(self):
+        self.valid = False
+
+    def rebuild(self, students, gpas):
+        """Sort the whole cohort once; ties keep their order in students"""
+        self._positions = {}
+        for position, student in enumerate(students):
+            self._positions.setdefault(student.id, []).append(position)
+        self._neg_gpas = (-gpas).tolist()
+        self._keys = sorted(zip(self._neg_gpas, range(len(students))))
+        self.size = len(students)
+        self.valid = True
+
+    def update(self, student_id, gpa):
+        """Move a student to their new rank in O(log S) search plus one list shift"""
+        if not self.valid:
+            return
+        for position in self._positions.get(student_id, ()):
+            del self._keys[bisect_left(self._keys, (self._neg_gpas[position], position))]
+            self._neg_gpas[position] = -gpa
+            insort(self._keys, (-gpa, position))
+
+    def window(self, start=0, stop=None):
+        """Return (position, gpa) pairs for ranks start..stop-1"""
+        return [(position, -neg_gpa) for neg_gpa, position in self._keys[start:stop]]
@@ -1,6 +1,15 @@
 class Student:
+    __slots__ = ('id', 'name', 'dob')
+
     def __init__(self, student_id, name, dob):
         self.id, self.name, self.dob = student_id, name, dob
 
     def __str__(self):
         return f"ID: {self.id}, Name: {self.name}, DOB: {self.dob}"
+
+    def __reduce__(self):
+        return Student, (self.id, self.name, self.dob)
+
+    def __setstate__(self, state):
+        # Records pickled before __slots__ carry their __dict__
+        self.id, self.name, self.dob = state['id'], state['name'], state['dob']
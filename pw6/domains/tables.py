@@ -0,0 +1,223 @@
+from array import array
+from collections.abc import MutableSequence
+
+from .student import Student
+from .course import Course
+
+
+class _RowView:
+    """One row of a table, read and written through the table's columns"""
+
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table, index):
+        self._table, self._index = table, index
+
+    def to_record(self):
+        """Return a standalone record holding this row's current values"""
+        table = self._table
+        return table.record_class(*(column[self._index] for column in table.columns))
+
+    def __reduce__(self):
+        # Pickle the values, not the whole table behind the view
+        return self.to_record().__reduce__()
+
+
+def _column(position):
+    def get(self):
+        return self._table.columns[position][self._index]
+
+    def set(self, value):
+        table = self._table
+        if position == 0:
+            # A new id goes through __setitem__ so positions stays in step
+            values = [column[self._index] for column in table.columns]
+            values[0] = value
+            table[self._index] = table.record_class(*values)
+        else:
+            table.columns[position][self._index] = value
+
+    return property(get, set)
+
+
+class StudentView(_RowView):
+    __slots__ = ()
+    id, name, dob = _column(0), _column(1), _column(2)
+    __str__ = Student.__str__
+
+
+class CourseView(_RowView):
+    __slots__ = ()
+    course_id, course_name, credits = _column(0), _column(1), _column(2)
+    __str__ = Course.__str__
+
+
+class _Table(MutableSequence):
+    """Records kept as parallel columns, handed out as row views
+
+    A view reads its row by position, so it follows whatever record is stored there;
+    like list indices, views past an insert or delete point shift to another row.
+    The first column is the record id; positions maps each id to its first row.
+    """
+
+    record_class = None
+    view_class = None
+    fields = ()  # record attributes, in column order, id first
+    kind = 'record'
+
+    def __init__(self, records=()):
+        self.columns = self._empty_columns()
+        self.positions = {}
+        self.extend(records)
+
+    def _empty_columns(self):
+        return tuple([] for _ in self.fields)
+
+    def _reindex(self):
+        ids = self.columns[0]
+        # Later rows are assigned first, so each id ends up at its first position
+        self.positions = dict(zip(reversed(ids), range(len(ids) - 1, -1, -1)))
+
+    @property
+    def ids(self):
+        return self.columns[0]
+
+    @property
+    def has_duplicates(self):
+        """True if some id appears on more than one row, e.g. in data saved before ids were checked"""
+        return len(self.positions) < len(self)
+
+    def position(self, record_id):
+        """Row of the first record with this id, or None"""
+        return self.positions.get(record_id)
+
+    def get(self, record_id, default=None):
+        """Row view of the record with this id, or default"""
+        index = self.positions.get(record_id)
+        return default if index is None else self.view_class(self, index)
+
+    def add(self, record):
+        """Append a record, refusing an id that is already taken"""
+        record_id = getattr(record, self.fields[0])
+        if record_id in self.positions:
+            raise ValueError(f"Duplicate {self.kind} id {record_id!r}")
+        self.append(record)
+
+    def upsert(self, record):
+        """Replace the record with the same id or append it; return True if it was added"""
+        index = self.positions.get(getattr(record, self.fields[0]))
+        if index is None:
+            self.append(record)
+            return True
+        self[index] = record
+        return False
+
+    def _values(self, record):
+        return tuple(getattr(record, field) for field in self.fields)
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.view_class(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("table index out of range")
+        return self.view_class(self, index)
+
+    def __iter__(self):
+        view_class = self.view_class
+        return (view_class(self, i) for i in range(len(self)))
+
+    def __setitem__(self, index, record):
+        if isinstance(index, slice):
+            raise TypeError("tables do not support slice assignment")
+        if index < 0:
+            index += len(self)
+        old_id = self.columns[0][index]
+        for column, value in zip(self.columns, self._values(record)):
+            column[index] = value
+        new_id = self.columns[0][index]
+        if new_id != old_id:
+            if self.positions.get(old_id) == index:
+                # Another row with the old id, if any, is now the first one
+                self._reindex()
+            else:
+                first = self.positions.get(new_id)
+                self.positions[new_id] = index if first is None else min(first, index)
+
+    def __delitem__(self, index):
+        for column in self.columns:
+            del column[index]
+        self._reindex()
+
+    def insert(self, index, record):
+        if index >= len(self):
+            self.append(record)
+            return
+        for column, value in zip(self.columns, self._values(record)):
+            column.insert(index, value)
+        self._reindex()
+
+    def append(self, record):
+        for column, value in zip(self.columns, self._values(record)):
+            column.append(value)
+        self.positions.setdefault(self.columns[0][-1], len(self) - 1)
+
+    def extend(self, records):
+        if isinstance(records, _Table) and records.fields == self.fields:
+            for column, values in zip(self.columns, records.columns):
+                column.extend(values)
+            self._reindex()
+            return
+        for record in records:
+            self.append(record)
+
+    def clear(self):
+        self.columns = self._empty_columns()
+        self.positions = {}
+
+    def copy(self):
+        """Return an independent table with the same rows, cheap enough for a snapshot"""
+        clone = type(self).__new__(type(self))
+        clone.columns = tuple(column[:] for column in self.columns)
+        clone.positions = dict(self.positions)
+        return clone
+
+    def records(self):
+        """Yield every row as a standalone record"""
+        return (self.record_class(*values) for values in zip(*self.columns))
+
+    def __getstate__(self):
+        return self.columns
+
+    def __setstate__(self, state):
+        # positions is not saved; rebuilding it is cheaper than pickling it
+        self.columns = state
+        self._reindex()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({len(self)} rows)"
+
+
+class StudentTable(_Table):
+    """Students as id, name and date-of-birth columns"""
+
+    record_class = Student
+    view_class = StudentView
+    fields = ('id', 'name', 'dob')
+    kind = 'student'
+
+
+class CourseTable(_Table):
+    """Courses as id and name columns plus credits in a compact integer array"""
+
+    record_class = Course
+    view_class = CourseView
+    fields = ('course_id', 'course_name', 'credits')
+    kind = 'course'
+
+    def _empty_columns(self):
+        return [], [], array('l')
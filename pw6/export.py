@@ -0,0 +1,123 @@
+import argparse
+import csv
+import json
+import os
+from itertools import islice
+
+from domains import MarkStore, StudentTable, CourseTable
+from domains.marks import SCALE
+from bulk_import import HEADERS
+from output import calculate_gpas
+
+
+CHUNK_SIZE = 10000  # rows handed to the writer at a time
+
+FORMATS = ('csv', 'jsonl')
+
+
+def iter_students(students):
+    if isinstance(students, StudentTable):
+        yield from zip(*students.columns)
+        return
+    for student in students:
+        yield student.id, student.name, student.dob
+
+
+def iter_courses(courses):
+    if isinstance(courses, CourseTable):
+        yield from zip(*courses.columns)
+        return
+    for course in courses:
+        yield course.course_id, course.course_name, course.credits
+
+
+def iter_marks(marks):
+    """Yield (student_id, course_id, mark), reading a MarkStore's arrays a chunk at a time"""
+    if not isinstance(marks, MarkStore):
+        for (student_id, course_id), mark in marks.items():
+            yield student_id, course_id, mark
+        return
+    for rows, cols, tenths in marks.coo_tenths_chunks(CHUNK_SIZE):
+        for row, col, mark in zip(rows.tolist(), cols.tolist(), tenths.tolist()):
+            yield marks.student_ids[row], marks.course_ids[col], mark / SCALE
+
+
+def iter_gpas(students, courses, marks, gpa_cache=None):
+    gpas = calculate_gpas(students, courses, marks, gpa_cache)
+    for start in range(0, len(students), CHUNK_SIZE):
+        chunk = zip(students[start:start + CHUNK_SIZE], gpas[start:start + CHUNK_SIZE].tolist())
+        for student, gpa in chunk:
+            yield student.id, student.name, round(gpa, 2)
+
+
+def chunked(rows):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_csv(path, header, rows):
+    """Write rows to a CSV file one chunk at a time, return the row count"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for chunk in chunked(rows):
+            writer.writerows(chunk)
+            count += len(chunk)
+    return count
+
+
+def write_jsonl(path, header, rows):
+    """Write rows as one JSON object per line, one chunk at a time, return the row count"""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for chunk in chunked(rows):
+            f.write("".join(json.dumps(dict(zip(header, row)), ensure_ascii=False) + "\n"
+                            for row in chunk))
+            count += len(chunk)
+    return count
+
+
+def export_all(directory, students, courses, marks, fmt='csv', gpa_cache=None):
+    """Export students, courses, marks and GPAs into directory, return {filename: rows}"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    writer = write_csv if fmt == 'csv' else write_jsonl
+    os.makedirs(directory, exist_ok=True)
+    # Same headers as bulk_import, so exported CSVs can be imported again
+    tables = [
+        ('students', HEADERS['students'], iter_students(students)),
+        ('courses', HEADERS['courses'], iter_courses(courses)),
+        ('marks', HEADERS['marks'], iter_marks(marks)),
+        ('gpas', ['student_id', 'name', 'gpa'], iter_gpas(students, courses, marks, gpa_cache)),
+    ]
+    written = {}
+    for name, header, rows in tables:
+        filename = f"{name}.{fmt}"
+        written[filename] = writer(os.path.join(directory, filename), header, rows)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export students.dat to CSV or JSON lines")
+    parser.add_argument('directory', help="output directory")
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    args = parser.parse_args()
+
+    # main imports this module, so it can only be loaded once we run as a script
+    from main import StudentManagementSystem
+    system = StudentManagementSystem()
+    # The app may be running and mid-way through a journal entry, so leave the journal alone
+    system.load_data(read_only=True)
+    written = export_all(args.directory, system.students, system.courses, system.marks,
+                         args.format, system.gpa_cache)
+    for filename, count in written.items():
+        print(f"{filename}: {count} rows")
+
+
+if __name__ == "__main__":
+    main()
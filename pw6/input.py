@@ -1,6 +1,7 @@
 import math
 import os
 from domains import Student, Course
+from bulk_import import import_csv
 
 
 DATA_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -30,54 +31,84 @@ def get_positive_int(prompt, stdscr=None, output_module=None, y=5):
                 print("Invalid input")
 
 
-def input_students(students, stdscr=None, output_module=None):
+def get_new_id(prompt, records, stdscr=None, output_module=None, y=5, width=25):
+    """Get an id that no record in records uses yet - works with both curses and regular mode"""
+    while True:
+        if stdscr and output_module:
+            record_id = output_module.get_input(stdscr, prompt, y, 5, width)
+        else:
+            record_id = input(prompt)
+        if records.position(record_id) is None:
+            return record_id
+        if stdscr and output_module:
+            output_module.draw_status_bar(stdscr, f"ID {record_id} already exists. Press any key...")
+            stdscr.getch()
+        else:
+            print(f"ID {record_id} already exists")
+
+
+def input_students(students, stdscr=None, output_module=None, journal=None):
     """Input student information"""
     if stdscr and output_module:
         num = get_positive_int("Number of students:", stdscr, output_module, 5)
         students.clear()
+        if journal:
+            journal.record('clear_students')
         for i in range(num):
             y_offset = 8 + (i * 12)
             stdscr.addstr(y_offset, 5, f"Student {i+1}:")
             stdscr.refresh()
-            sid = output_module.get_input(stdscr, "ID:", y_offset + 2, 5, 25)
+            sid = get_new_id("ID:", students, stdscr, output_module, y_offset + 2)
             name = output_module.get_input(stdscr, "Name:", y_offset + 5, 5, 35)
             dob = output_module.get_input(stdscr, "DOB:", y_offset + 8, 5, 25)
-            students.append(Student(sid, name, dob))
+            students.add(Student(sid, name, dob))
+            if journal:
+                journal.record('add_student', sid, name, dob)
         output_module.draw_status_bar(stdscr, f"Added {num} student(s). Press any key...")
         stdscr.getch()
     else:
         num = get_positive_int("Number of students: ")
         students.clear()
+        if journal:
+            journal.record('clear_students')
         for i in range(num):
             print(f"Student {i+1}:")
-            sid = input(" ID: ")
+            sid = get_new_id(" ID: ", students)
             name = input(" Full name: ")
             dob = input(" DOB: ")
-            students.append(Student(sid, name, dob))
+            students.add(Student(sid, name, dob))
+            if journal:
+                journal.record('add_student', sid, name, dob)
         print(f"Added {num} student(s).")
 
 
-def input_courses(courses, stdscr=None, output_module=None):
+def input_courses(courses, stdscr=None, output_module=None, journal=None):
     """Input course information"""
     if stdscr and output_module:
         num = get_positive_int("Number of courses:", stdscr, output_module, 5)
         courses.clear()
+        if journal:
+            journal.record('clear_courses')
         for i in range(num):
             y_offset = 8 + (i * 12)
             stdscr.addstr(y_offset, 5, f"Course {i+1}:")
             stdscr.refresh()
-            cid = output_module.get_input(stdscr, "Course ID:", y_offset + 2, 5, 25)
+            cid = get_new_id("Course ID:", courses, stdscr, output_module, y_offset + 2)
             cname = output_module.get_input(stdscr, "Course name:", y_offset + 5, 5, 35)
             credits = get_positive_int("Credits:", stdscr, output_module, y_offset + 8)
-            courses.append(Course(cid, cname, credits))
+            courses.add(Course(cid, cname, credits))
+            if journal:
+                journal.record('add_course', cid, cname, credits)
         output_module.draw_status_bar(stdscr, f"Added {num} course(s). Press any key...")
         stdscr.getch()
     else:
         num = get_positive_int("Enter number of courses: ")
         courses.clear()
+        if journal:
+            journal.record('clear_courses')
         for i in range(num):
             print(f"Course {i+1}:")
-            cid = input("Course ID: ")
+            cid = get_new_id("Course ID: ", courses)
             cname = input("Course name: ")
             while True:
                 try:
@@ -87,11 +118,13 @@ def input_courses(courses, stdscr=None, output_module=None):
                     print("Credits must > 0")
                 except ValueError:
                     print("Invalid input")
-            courses.append(Course(cid, cname, credits))
+            courses.add(Course(cid, cname, credits))
+            if journal:
+                journal.record('add_course', cid, cname, credits)
         print(f"Added {num} course(s).")
 
 
-def input_marks(students, courses, marks, stdscr=None, output_module=None):
+def input_marks(students, courses, marks, stdscr=None, output_module=None, journal=None):
     """Input marks for students in a course"""
     if stdscr and output_module:
         if not courses or not students:
@@ -128,6 +161,8 @@ def input_marks(students, courses, marks, stdscr=None, output_module=None):
                     if 0 <= mark <= 20:
                         mark = math.floor(mark * 10) / 10
                         marks[(student.id, course.course_id)] = mark
+                        if journal:
+                            journal.record('mark', student.id, course.course_id, mark)
                         y += 3
                         break
                     output_module.draw_status_bar(stdscr, "Enter 0-20. Press any key...")
@@ -159,6 +194,8 @@ def input_marks(students, courses, marks, stdscr=None, output_module=None):
                     if 0 <= mark <= 20:
                         mark = math.floor(mark * 10) / 10
                         marks[(student.id, course.course_id)] = mark
+                        if journal:
+                            journal.record('mark', student.id, course.course_id, mark)
                         break
                     print("Enter 0-20")
                 except ValueError:
@@ -169,3 +206,34 @@ def input_marks(students, courses, marks, stdscr=None, output_module=None):
             key = (student.id, course.course_id)
             if key in marks:
                 print(f"{student.name} (ID: {student.id}): {marks[key]}")
+
+
+def input_csv(students, courses, marks, stdscr=None, output_module=None):
+    """Bulk import a students, courses or marks CSV file, return the ImportResult"""
+    if stdscr and output_module:
+        path = output_module.get_input(stdscr, "CSV file:", 5, 5, 50)
+        try:
+            result = import_csv(path.strip(), students, courses, marks)
+        except (OSError, ValueError) as e:
+            output_module.draw_status_bar(stdscr, f"Import failed: {e}. Press any key...")
+            stdscr.getch()
+            return None
+        height, width = stdscr.getmaxyx()
+        output_module.draw_highlight(stdscr, 8, 5, str(result))
+        for row, (line_no, reason) in enumerate(result.errors[:max(height - 13, 0)]):
+            stdscr.addstr(10 + row, 5, f"Line {line_no}: {reason}"[:width - 6])
+        output_module.draw_status_bar(stdscr, "Import finished. Press any key...")
+        stdscr.getch()
+    else:
+        path = input("CSV file: ")
+        try:
+            result = import_csv(path.strip(), students, courses, marks)
+        except (OSError, ValueError) as e:
+            print(f"Import failed: {e}")
+            return None
+        print(result)
+        for line_no, reason in result.errors:
+            print(f"  Line {line_no}: {reason}")
+        if result.error_count > len(result.errors):
+            print(f"  ... and {result.error_count - len(result.errors)} more")
+    return result
@@ -0,0 +1,134 @@
+import os
+
+from domains import Student, Course
+from lazy import lazy_import
+
+# Loaded with the first entry written or replayed, not at startup
+pickle = lazy_import('pickle')
+shutil = lazy_import('shutil')
+
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+JOURNAL_FILE = os.path.join(DATA_DIR, "students.journal")
+ROTATED_JOURNAL_FILE = JOURNAL_FILE + ".1"  # entries a background snapshot is still writing
+COMPACT_EVERY = 1000  # entries before the journal is folded into students.dat
+
+# students.dat section each operation changes
+SECTIONS = ('students', 'courses', 'marks')
+SECTION_OF = {
+    'clear_students': 'students',
+    'add_student': 'students',
+    'clear_courses': 'courses',
+    'add_course': 'courses',
+    'mark': 'marks',
+}
+
+
+def apply_entry(op, args, students, courses, marks):
+    """Apply one journal entry to the in-memory collections"""
+    if op == 'clear_students':
+        students.clear()
+    elif op == 'add_student':
+        students.append(Student(*args))
+    elif op == 'clear_courses':
+        courses.clear()
+    elif op == 'add_course':
+        courses.append(Course(*args))
+    elif op == 'mark':
+        student_id, course_id, mark = args
+        marks[(student_id, course_id)] = mark
+
+
+class Journal:
+    """Append-only log of student, course and mark mutations"""
+
+    def __init__(self, path=JOURNAL_FILE, compact_every=COMPACT_EVERY):
+        self.path = path
+        self.rotated_path = path + ".1"
+        self.compact_every = compact_every
+        self.count = 0
+        # Sections changed since the last snapshot; only these need saving again
+        self.dirty = set()
+        self._file = None
+
+    def record(self, op, *args):
+        """Append one mutation to the end of the journal"""
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        pickle.dump((op, args), self._file)
+        self._file.flush()
+        self.count += 1
+        self.dirty.add(SECTION_OF[op])
+
+    def replay(self, students, courses, marks, repair=True):
+        """Apply every entry on top of the loaded snapshot, return the number applied
+
+        With repair, a torn last entry is cut off so new entries can follow it. Readers that
+        may run beside the app, such as export, pass repair=False: what looks torn to them
+        may be an entry the app is still writing.
+        """
+        # A rotated journal still exists if its snapshot never finished, so it goes first
+        self.count = 0
+        for path in (self.rotated_path, self.path):
+            if os.path.exists(path):
+                self.count += self._replay_file(path, students, courses, marks, repair)
+        return self.count
+
+    def _replay_file(self, path, students, courses, marks, repair):
+        count = 0
+        with open(path, 'r+b' if repair else 'rb') as f:
+            good = 0
+            while True:
+                try:
+                    op, args = pickle.load(f)
+                except EOFError:
+                    break
+                except (pickle.UnpicklingError, ValueError, TypeError):
+                    break
+                apply_entry(op, args, students, courses, marks)
+                self.dirty.add(SECTION_OF[op])
+                count += 1
+                good = f.tell()
+            if repair:
+                # Cut off a torn tail left by a crash mid-write so new entries stay readable
+                f.truncate(good)
+        return count
+
+    def needs_compaction(self):
+        """Return True once enough entries have built up to rewrite the snapshot"""
+        return self.count >= self.compact_every
+
+    def truncate(self):
+        """Drop all entries, called after they are folded into a snapshot"""
+        self.close()
+        for path in (self.rotated_path, self.path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.count = 0
+        self.dirty.clear()
+
+    def rotate(self):
+        """Set the current entries aside for a background snapshot and start a new journal"""
+        self.close()
+        if os.path.exists(self.rotated_path) and os.path.exists(self.path):
+            # The last snapshot failed, so its entries are still only here; add ours after them
+            with open(self.rotated_path, 'ab') as rotated, open(self.path, 'rb') as current:
+                shutil.copyfileobj(current, rotated)
+                rotated.flush()
+                os.fsync(rotated.fileno())
+            os.remove(self.path)
+        elif os.path.exists(self.path):
+            os.replace(self.path, self.rotated_path)
+        self.count = 0
+        self.dirty.clear()
+
+    def discard_rotated(self):
+        """Drop the rotated entries once a snapshot covering all of them is safely on disk"""
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def close(self):
+        """Close the journal file if it is open"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
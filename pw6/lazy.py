@@ -0,0 +1,15 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """Return module name, executed only when one of its attributes is first used"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
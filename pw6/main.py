@@ -1,20 +1,53 @@
 import curses
 import os
-import pickle
-import gzip
+import time
 from curses import wrapper
 
-from domains import Student, Course
+from domains import Student, Course, MarkStore, GPACache, StudentTable, CourseTable
+from journal import Journal, JOURNAL_FILE, ROTATED_JOURNAL_FILE, SECTIONS
+import datafile
+from lazy import lazy_import
 import input as input_module
 import output as output_module
 
+# Loaded on first use so the menu appears before they are needed
+export = lazy_import('export')
+sqlite_store = lazy_import('sqlite_store')
+markfile = lazy_import('markfile')
+
 
 DATA_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_FILE = os.path.join(DATA_DIR, "students.dat")
+# "pickle" keeps everything in memory with students.dat + journal, "sqlite" uses students.db
+BACKEND = os.environ.get("SMS_BACKEND", "pickle")
+# Seconds between background snapshots while there are journal entries to fold in;
+# 0 or less turns autosave off, leaving only compaction once the journal is large
+AUTOSAVE_INTERVAL = int(os.environ.get("SMS_AUTOSAVE", "60"))
+# "pickle" keeps marks as a section of students.dat, "mmap" in MARK_FILE, which is
+# memory-mapped on load so only the marks that are used get read
+MARK_FORMAT = os.environ.get("SMS_MARKS", "pickle")
+MARK_FILE = os.path.join(DATA_DIR, "students.marks")
+LOAD_FAILED = ("Saved data did not load fully; it is left as is, changes are kept in the journal only "
+               "and CSV import is off.")
+
+
+def save_sections(path, sections, codec=datafile.DEFAULT_CODEC):
+    """datafile.save_sections, except that marks go to MARK_FILE when MARK_FORMAT is "mmap"
+
+    Whichever format is used, the other copy of the marks is dropped or left stale, and
+    load_data_pickle prefers MARK_FILE whenever it exists.
+    """
+    sections = dict(sections)
+    if 'marks' in sections and MARK_FORMAT == "mmap":
+        markfile.save(MARK_FILE, sections.pop('marks'))
+    if sections:
+        datafile.save_sections(path, sections, codec)
+    if 'marks' in sections and os.path.exists(MARK_FILE):
+        os.remove(MARK_FILE)
 
 
-def save_data_pickle(students, courses, marks):
-    """Save students, courses, and marks using pickle with gzip compression"""
+def save_data_pickle(students, courses, marks, codec=datafile.DEFAULT_CODEC, sections=SECTIONS):
+    """Save the given sections of students, courses, and marks using pickle, compressed with codec"""
     data = {
         'students': students,
         'courses': courses,
@@ -22,8 +55,7 @@ def save_data_pickle(students, courses, marks):
     }
 
     try:
-        with gzip.open(DATA_FILE, 'wb') as f:
-            pickle.dump(data, f)
+        save_sections(DATA_FILE, {name: data[name] for name in sections}, codec)
         return True
     except Exception as e:
         print(f"Error saving data: {e}")
@@ -31,52 +63,209 @@ def save_data_pickle(students, courses, marks):
 
 
 def load_data_pickle():
-    """Load students, courses, and marks from pickle with gzip compression"""
-    students = []
-    courses = []
-    marks = {}
+    """Load students, courses, and marks, detecting the codec from the file header
 
-    if not os.path.exists(DATA_FILE):
-        return students, courses, marks
+    Returns them with a flag that is False if DATA_FILE or MARK_FILE could not be read; what
+    did load is kept, and the caller must not save over the file that failed.
+    """
+    students = StudentTable()
+    courses = CourseTable()
+    marks = MarkStore()
+    complete = True
 
-    try:
-        with gzip.open(DATA_FILE, 'rb') as f:
-            data = pickle.load(f)
-            students = data.get('students', [])
-            courses = data.get('courses', [])
-            marks = data.get('marks', {})
-    except Exception as e:
-        print(f"Error loading data: {e}")
+    mark_file = os.path.exists(MARK_FILE)
+    if not (mark_file or os.path.exists(DATA_FILE)):
+        return students, courses, marks, complete
+
+    data = {}
+    if os.path.exists(DATA_FILE):
+        try:
+            # A marks section next to MARK_FILE is stale, so it is not even unpickled
+            data = datafile.load(DATA_FILE, ('students', 'courses') if mark_file else None)
+        except Exception as e:
+            print(f"Error loading data: {e}")
+            complete = False
+    if mark_file:
+        try:
+            data['marks'] = markfile.open_marks(MARK_FILE)
+        except Exception as e:
+            print(f"Error loading marks: {e}")
+            complete = False
+    students = data.get('students', students)
+    courses = data.get('courses', courses)
+    marks = data.get('marks', marks)
+    if not isinstance(students, StudentTable):
+        # students.dat written before the columnar tables held lists of records
+        students = StudentTable(students)
+    if not isinstance(courses, CourseTable):
+        courses = CourseTable(courses)
+    if not isinstance(marks, MarkStore):
+        # students.dat written before the mark matrix held a plain dict
+        marks = MarkStore(marks)
 
-    return students, courses, marks
+    return students, courses, marks, complete
 
 
 class StudentManagementSystem:
-    def __init__(self, stdscr=None):
-        self.students = []
-        self.courses = []
-        self.marks = {}
+    def __init__(self, stdscr=None, backend=BACKEND):
+        self.backend = backend
+        if backend == "sqlite":
+            # Every write is its own SQLite transaction, so there is nothing to journal
+            self.conn, self.students, self.courses, self.marks = sqlite_store.open_collections()
+            self.journal = None
+            self.data_name = os.path.basename(sqlite_store.DB_FILE)
+        else:
+            self.students = StudentTable()
+            self.courses = CourseTable()
+            self.marks = MarkStore()
+            self.journal = Journal()
+            self.data_name = os.path.basename(DATA_FILE)
+        self.saver = datafile.BackgroundSaver(save_sections)
+        # Set when students.dat or students.marks failed to load; snapshots would overwrite
+        # them with whatever did load, so changes then stay in the journal only
+        self.load_failed = False
+        self.last_snapshot = time.monotonic()
+        self.gpa_cache = GPACache()
+        self.attach_gpa_cache()
         self.stdscr = stdscr
         if stdscr:
             output_module.setup_colors()
 
-    def load_data(self):
-        """Load data from students.dat if it exists"""
-        if os.path.exists(DATA_FILE):
-            self.students, self.courses, self.marks = load_data_pickle()
-            return True
-        return False
+    def load_data(self, read_only=False):
+        """Load the students.dat snapshot, then replay the journal on top of it
+
+        read_only leaves the journal exactly as it is, for readers beside a running app.
+        """
+        if self.backend == "sqlite":
+            return len(self.students) > 0 or len(self.courses) > 0
+        if not any(os.path.exists(path)
+                   for path in (DATA_FILE, MARK_FILE, JOURNAL_FILE, ROTATED_JOURNAL_FILE)):
+            return False
+        self.students, self.courses, self.marks, complete = load_data_pickle()
+        self.load_failed = not complete
+        self.journal.replay(self.students, self.courses, self.marks, repair=not read_only)
+        self.attach_gpa_cache()
+        return True
+
+    def attach_gpa_cache(self):
+        """Keep the GPA cache in step with every write to the current mark store"""
+        self.marks.listeners.append(self.gpa_cache.on_mark)
+        self.gpa_cache.invalidate()
 
     def save_data(self):
-        """Save data using pickle with compression"""
-        save_data_pickle(self.students, self.courses, self.marks)
+        """Fold the journal into students.dat once it has grown past the compaction threshold
+
+        A snapshot that failed in the background is retried here in the foreground, since
+        what it held may not be in the journal, e.g. a CSV import.
+        """
+        if self.backend == "sqlite":
+            self.conn.close()
+            return
+        self.saver.wait()
+        if self.journal.needs_compaction() or self.saver.error:
+            self.compact()
+        self.journal.close()
+
+    def maybe_compact(self):
+        """Snapshot in the background once the journal is large or the autosave interval has passed
+
+        A failed snapshot counts as unsaved changes, so it is retried at the next interval.
+        """
+        if not self.journal or self.saver.busy or self.load_failed:
+            return
+        if not (self.journal.count or self.saver.error):
+            return
+        if (self.journal.needs_compaction()
+                or 0 < AUTOSAVE_INTERVAL <= time.monotonic() - self.last_snapshot):
+            self.compact(background=True)
+
+    def import_csv(self):
+        """Bulk import a CSV file, then snapshot it since imports bypass the journal"""
+        if self.load_failed:
+            # No snapshot can be taken, and the journal would not hold the imported rows
+            message = "Import is unavailable until the saved data loads fully."
+            if self.stdscr:
+                output_module.draw_highlight(self.stdscr, 5, 5, message[:self.stdscr.getmaxyx()[1] - 6])
+            else:
+                print(message)
+            return
+        # Rebuilt once on the next GPA view rather than updated for every imported mark
+        self.gpa_cache.invalidate()
+        if self.stdscr:
+            result = input_module.input_csv(self.students, self.courses, self.marks,
+                                            self.stdscr, output_module)
+        else:
+            result = input_module.input_csv(self.students, self.courses, self.marks)
+        if result and (result.added or result.updated):
+            if self.journal:
+                self.journal.dirty.add(result.kind)
+            self.compact(background=True)
+
+    def export_data(self):
+        """Export rosters, marks and GPAs as CSV or JSON lines"""
+        if self.stdscr:
+            directory = output_module.get_input(self.stdscr, "Output directory:", 5, 5, 50)
+            fmt = output_module.get_input(self.stdscr, "Format (csv/jsonl):", 8, 5, 10)
+        else:
+            directory = input("Output directory: ")
+            fmt = input("Format (csv/jsonl): ")
+        try:
+            written = export.export_all(directory.strip(), self.students, self.courses,
+                                        self.marks, fmt.strip().lower() or 'csv', self.gpa_cache)
+            message = "Exported " + ", ".join(f"{name} ({count})" for name, count in written.items())
+        except (OSError, ValueError) as e:
+            message = f"Export failed: {e}"
+        if self.stdscr:
+            output_module.draw_highlight(self.stdscr, 11, 5, message[:self.stdscr.getmaxyx()[1] - 6])
+        else:
+            print(message)
+
+    def dirty_sections(self):
+        """Sections of students.dat that differ from memory, in SECTIONS order"""
+        if self.saver.error or not datafile.is_sectioned(DATA_FILE):
+            # A failed save or an older single-payload file has to be written out whole
+            return SECTIONS
+        dirty = set(self.journal.dirty)
+        if os.path.exists(MARK_FILE) != (MARK_FORMAT == "mmap"):
+            # SMS_MARKS changed since the last save; move the marks to the other format
+            dirty.add('marks')
+        return tuple(name for name in SECTIONS if name in dirty)
+
+    def compact(self, background=False):
+        """Save the changed sections of students.dat and start a fresh journal"""
+        if self.backend == "sqlite" or self.load_failed:
+            return
+        self.saver.wait()
+        self.last_snapshot = time.monotonic()
+        sections = self.dirty_sections()
+        if not sections:
+            self.journal.truncate()
+            return
+        if not background:
+            if save_data_pickle(self.students, self.courses, self.marks, sections=sections):
+                self.saver.error = None
+                self.journal.truncate()
+            return
+        # Copies of the columns are a consistent snapshot the worker can pickle
+        # while the UI carries on
+        copies = {
+            'students': self.students.copy,
+            'courses': self.courses.copy,
+            'marks': self.marks.snapshot
+        }
+        data = {name: copies[name]() for name in sections}
+        self.journal.rotate()
+        self.saver.save(data, DATA_FILE, on_done=self.journal.discard_rotated)
 
     def run_curses(self):
         """Run the system with curses-decorated UI"""
         # Load existing data on startup
         if self.load_data():
-            output_module.draw_status_bar(self.stdscr, "Data loaded from students.dat. Press any key...")
+            output_module.draw_status_bar(self.stdscr, f"Data loaded from {self.data_name}. Press any key...")
             self.stdscr.getch()
+            if self.load_failed:
+                output_module.draw_status_bar(self.stdscr, LOAD_FAILED + " Press any key...")
+                self.stdscr.getch()
 
         current_row = 0
         menu_options = [
@@ -87,58 +276,100 @@ class StudentManagementSystem:
             "Input marks",
             "Show student GPAs",
             "Sort students by GPA",
+            "Course statistics",
+            "Import CSV",
+            "Export data",
             "Exit"
         ]
 
+        # Repaint everything only on start, resize or return from a sub-screen
+        full_redraw = True
+        self.set_menu_timeout()
         while True:
-            output_module.draw_menu(self.stdscr, current_row, menu_options,
-                                    self.students, self.courses)
+            if full_redraw:
+                output_module.draw_menu(self.stdscr, current_row, menu_options,
+                                        self.students, self.courses)
+                full_redraw = False
 
             key = self.stdscr.getch()
 
-            if key == curses.KEY_UP and current_row > 0:
+            if key == -1:
+                self.maybe_compact()
+            elif key == curses.KEY_UP and current_row > 0:
                 current_row -= 1
+                output_module.move_menu_selection(self.stdscr, current_row + 1,
+                                                  current_row, menu_options)
             elif key == curses.KEY_DOWN and current_row < len(menu_options) - 1:
                 current_row += 1
+                output_module.move_menu_selection(self.stdscr, current_row - 1,
+                                                  current_row, menu_options)
+            elif key == curses.KEY_RESIZE:
+                full_redraw = True
             elif key == ord('\n'):
                 if current_row == len(menu_options) - 1:  # Exit
                     self.save_data()
                     break
                 else:
+                    # Sub-screens expect blocking input
+                    self.stdscr.timeout(-1)
                     self.handle_menu_selection(current_row)
+                    self.set_menu_timeout()
+                    full_redraw = True
+
+    def set_menu_timeout(self):
+        """Wake up while idle in the menu so autosave still happens, block if it is off"""
+        self.stdscr.timeout(AUTOSAVE_INTERVAL * 1000 if AUTOSAVE_INTERVAL > 0 else -1)
 
     def handle_menu_selection(self, selection):
         """Handle menu selections with curses UI"""
         self.stdscr.clear()
         output_module.draw_title(self.stdscr, "STUDENT MANAGEMENT SYSTEM")
 
+        # Scrollable views return True once the user has left them with a key press
+        done = False
         if selection == 0:
-            input_module.input_students(self.students, self.stdscr, output_module)
+            input_module.input_students(self.students, self.stdscr, output_module,
+                                       self.journal)
+            self.gpa_cache.rank_index.invalidate()
         elif selection == 1:
-            input_module.input_courses(self.courses, self.stdscr, output_module)
+            input_module.input_courses(self.courses, self.stdscr, output_module,
+                                      self.journal)
+            self.gpa_cache.invalidate()
         elif selection == 2:
-            output_module.list_students(self.stdscr, self.students)
+            done = output_module.list_students(self.stdscr, self.students)
         elif selection == 3:
-            output_module.list_courses(self.stdscr, self.courses)
+            done = output_module.list_courses(self.stdscr, self.courses)
         elif selection == 4:
             input_module.input_marks(self.students, self.courses, self.marks,
-                                     self.stdscr, output_module)
+                                     self.stdscr, output_module, self.journal)
         elif selection == 5:
-            output_module.show_student_gpa(self.stdscr, self.students,
-                                           self.courses, self.marks)
+            done = output_module.show_student_gpa(self.stdscr, self.students,
+                                                  self.courses, self.marks, self.gpa_cache)
         elif selection == 6:
-            output_module.sort_students_by_gpa(self.stdscr, self.students,
-                                               self.courses, self.marks)
+            done = output_module.sort_students_by_gpa(self.stdscr, self.students,
+                                                      self.courses, self.marks, self.gpa_cache)
+        elif selection == 7:
+            done = output_module.show_course_stats(self.stdscr, self.students,
+                                                   self.courses, self.marks)
+        elif selection == 8:
+            self.import_csv()
+        elif selection == 9:
+            self.export_data()
+
+        self.maybe_compact()
 
-        output_module.draw_status_bar(self.stdscr, "Press any key to continue...")
-        self.stdscr.getch()
+        if not done:
+            output_module.draw_status_bar(self.stdscr, "Press any key to continue...")
+            self.stdscr.getch()
 
     def run(self):
         """Run in console mode (non-curses)"""
         # Load existing data on startup
         if self.load_data():
-            print("Data loaded from students.dat")
+            print(f"Data loaded from {self.data_name}")
             print(f"  Loaded {len(self.students)} students, {len(self.courses)} courses, {len(self.marks)} marks")
+            if self.load_failed:
+                print(LOAD_FAILED)
 
         while True:
             print("\n1. Input students")
@@ -148,32 +379,46 @@ class StudentManagementSystem:
             print("5. Input marks")
             print("6. Show student GPAs")
             print("7. Sort students by GPA")
+            print("8. Course statistics")
+            print("9. Import CSV")
+            print("10. Export data")
             print("0. Exit")
             choice = input("Enter choice: ")
 
             if choice == '0':
                 self.save_data()
-                print("Data compressed to students.dat. Exiting.")
+                print("Data saved. Exiting.")
                 break
             elif choice == '1':
-                input_module.input_students(self.students)
+                input_module.input_students(self.students, journal=self.journal)
+                self.gpa_cache.rank_index.invalidate()
             elif choice == '2':
-                input_module.input_courses(self.courses)
+                input_module.input_courses(self.courses, journal=self.journal)
+                self.gpa_cache.invalidate()
             elif choice == '3':
                 output_module.list_students(None, self.students)
             elif choice == '4':
                 output_module.list_courses(None, self.courses)
             elif choice == '5':
-                input_module.input_marks(self.students, self.courses, self.marks)
+                input_module.input_marks(self.students, self.courses, self.marks,
+                                         journal=self.journal)
             elif choice == '6':
                 output_module.show_student_gpa(None, self.students,
-                                               self.courses, self.marks)
+                                               self.courses, self.marks, self.gpa_cache)
             elif choice == '7':
                 output_module.sort_students_by_gpa(None, self.students,
-                                                   self.courses, self.marks)
+                                                   self.courses, self.marks, self.gpa_cache)
+            elif choice == '8':
+                output_module.show_course_stats(None, self.students, self.courses, self.marks)
+            elif choice == '9':
+                self.import_csv()
+            elif choice == '10':
+                self.export_data()
             else:
                 print("Invalid choice.")
 
+            self.maybe_compact()
+
 
 def main(stdscr):
     """Main function to run with curses"""
@@ -0,0 +1,94 @@
+import pickle
+import struct
+
+import datafile
+from domains import MarkStore
+from domains.marks import tenths_array
+from lazy import lazy_import
+
+np = lazy_import('numpy')
+
+
+# students.marks: HEADER, then a MarkStore's CSR arrays uncompressed, each on an ALIGN
+# boundary so they can be memory-mapped and used in place, then the pickled row and column ids
+MAGIC = b'SMSM'
+VERSION = 2
+HEADER = struct.Struct('<4sIqqqq')  # magic, version, students, courses, marks, dense limit
+ALIGN = 64
+
+# version -> (name, dtype, length) of each array for n students and m marks
+ARRAYS = {
+    1: (('indptr', '<i8', lambda n, m: n + 1),
+        ('indices', '<i4', lambda n, m: m),
+        ('data', '<f8', lambda n, m: m)),  # marks as floats
+    2: (('indptr', '<i8', lambda n, m: n + 1),
+        ('indices', '<i4', lambda n, m: m),
+        ('tenths', 'u1', lambda n, m: m)),
+}
+
+
+def _align(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def _layout(version, n_students, n_marks):
+    """{array: (offset, dtype, length)} and the offset of the ids after them"""
+    layout = {}
+    offset = _align(HEADER.size)
+    for name, dtype, length in ARRAYS[version]:
+        count = length(n_students, n_marks)
+        layout[name] = (offset, dtype, count)
+        offset = _align(offset + count * np.dtype(dtype).itemsize)
+    return layout, offset
+
+
+def save(path, marks):
+    """Write marks to path as a mark file, replacing it atomically
+
+    The file is never modified in place, so stores mapped from an older version of it
+    keep reading the old contents.
+    """
+    # The same CSR buffers a MarkStore pickles
+    state = marks.__getstate__()
+    n_students, n_marks = len(state['student_ids']), state['count']
+    layout, ids_offset = _layout(VERSION, n_students, n_marks)
+    chunks = [HEADER.pack(MAGIC, VERSION, n_students, len(state['course_ids']), n_marks,
+                          state['dense_limit'])]
+    position = HEADER.size
+    for name, (offset, _, _) in layout.items():
+        chunks.append(bytes(offset - position))
+        buffer = memoryview(state[name])
+        chunks.append(buffer)
+        position = offset + buffer.nbytes
+    chunks.append(bytes(ids_offset - position))
+    chunks.append(pickle.dumps((state['student_ids'], state['course_ids'])))
+    datafile.write_atomic(path, chunks)
+
+
+def open_marks(path):
+    """Return a MarkStore over the arrays in path, memory-mapped copy-on-write
+
+    Opening reads only the header and the ids; the pages of a student's marks are read
+    the first time they are touched, and writes stay in memory until the store is saved.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size or header[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a students.marks file")
+        _, version, n_students, n_courses, n_marks, dense_limit = HEADER.unpack(header)
+        if version > VERSION:
+            raise ValueError(f"students.marks version {version} is newer than this program")
+        layout, ids_offset = _layout(version, n_students, n_marks)
+        f.seek(ids_offset)
+        student_ids, course_ids = pickle.loads(f.read())
+    if (len(student_ids), len(course_ids)) != (n_students, n_courses):
+        raise ValueError("students.marks ids do not match its header")
+    mapped = np.memmap(path, dtype=np.uint8, mode='c', shape=(ids_offset,))
+    arrays = {name: mapped[offset:offset + count * np.dtype(dtype).itemsize].view(dtype)
+              for name, (offset, dtype, count) in layout.items()}
+    if version == 1:
+        # Converting the floats reads every mark once; saving the marks again writes version 2
+        arrays['tenths'] = tenths_array(arrays['data'])
+    return MarkStore.from_csr(student_ids, course_ids, arrays['indptr'], arrays['indices'],
+                              arrays['tenths'], dense_limit)
+
@@ -1,6 +1,15 @@
 import curses
 from curses.textpad import rectangle
-import numpy as np
+
+from domains import MarkStore, StudentTable, CourseTable
+from domains.marks import SCALE, to_tenths
+from lazy import lazy_import
+
+# NumPy is only loaded by the first GPA computation
+np = lazy_import('numpy')
+# Imports this module, so it is only loaded once the statistics view is opened
+course_stats = lazy_import('course_stats')
+parallel = lazy_import('parallel')
 
 
 def setup_colors():
@@ -69,26 +78,70 @@ def get_input(stdscr, prompt, y, x, width=30):
     return user_input
 
 
+def scroll_list(stdscr, title, count, fetch_rows):
+    """Show count rows in a scrollable window, formatting and drawing only the visible rows"""
+    top = 0
+    stdscr.move(5, 0)
+    stdscr.clrtobot()
+    while True:
+        height, width = stdscr.getmaxyx()
+        page = max(height - 10, 1)
+        top = max(0, min(top, count - page))
+        draw_highlight(stdscr, 5, 5, f"{title}:")
+        rows = fetch_rows(top, min(top + page, count))
+        for line in range(page):
+            y = 7 + line
+            stdscr.move(y, 0)
+            stdscr.clrtoeol()
+            if line < len(rows):
+                stdscr.addstr(y, 5, rows[line][:width - 6])
+        stdscr.move(8 + page, 0)
+        stdscr.clrtoeol()
+        stdscr.attron(curses.color_pair(2))
+        stdscr.addstr(8 + page, 5, f"Total: {count}"[:width - 6])
+        stdscr.attroff(curses.color_pair(2))
+        draw_status_bar(stdscr, f"Rows {top + 1}-{top + len(rows)} of {count} | "
+                                "Up/Down PgUp/PgDn Home/End | g: go to row | q: back")
+        stdscr.refresh()
+
+        key = stdscr.getch()
+        if key == curses.KEY_DOWN:
+            top += 1
+        elif key == curses.KEY_UP:
+            top -= 1
+        elif key == curses.KEY_NPAGE:
+            top += page
+        elif key == curses.KEY_PPAGE:
+            top -= page
+        elif key == curses.KEY_HOME:
+            top = 0
+        elif key == curses.KEY_END:
+            top = count
+        elif key == ord('g'):
+            try:
+                top = int(get_input(stdscr, "Go to row:", height - 3, 5, 10)) - 1
+            except ValueError:
+                pass
+            stdscr.move(5, 0)
+            stdscr.clrtobot()
+        elif key == curses.KEY_RESIZE:
+            stdscr.clear()
+            draw_title(stdscr, "STUDENT MANAGEMENT SYSTEM")
+        else:
+            return
+
+
 def list_items(stdscr, items, title):
     """Display a list of items"""
     if stdscr:
         if not items:
             stdscr.addstr(5, 5, f"No {title.lower()} available.")
             stdscr.refresh()
-            return
-        y = 5
-        stdscr.attron(curses.color_pair(3) | curses.A_BOLD)
-        stdscr.addstr(y, 5, f"{title}:")
-        stdscr.attroff(curses.color_pair(3) | curses.A_BOLD)
-        y += 2
-        for idx, item in enumerate(items, 1):
-            stdscr.addstr(y, 5, f"{idx}. {item}")
-            y += 1
-        y += 1
-        stdscr.attron(curses.color_pair(2))
-        stdscr.addstr(y, 5, f"Total: {len(items)}")
-        stdscr.attroff(curses.color_pair(2))
-        stdscr.refresh()
+            return False
+        scroll_list(stdscr, title, len(items),
+                    lambda start, stop: [f"{idx}. {item}" for idx, item in
+                                         enumerate(items[start:stop], start + 1)])
+        return True
     else:
         if not items:
             return print(f"No {title.lower()} available.")
@@ -100,12 +153,12 @@ def list_items(stdscr, items, title):
 
 def list_students(stdscr, students):
     """Display list of students"""
-    list_items(stdscr, students, "Students")
+    return list_items(stdscr, students, "Students")
 
 
 def list_courses(stdscr, courses):
     """Display list of courses"""
-    list_items(stdscr, courses, "Courses")
+    return list_items(stdscr, courses, "Courses")
 
 
 def calculate_gpa(student, courses, marks):
@@ -114,101 +167,260 @@ def calculate_gpa(student, courses, marks):
         return 0.0
     marks_array = []
     credits_array = []
-    for course in courses:
-        key = (student.id, course.course_id)
-        if key in marks:
-            marks_array.append(marks[key])
-            credits_array.append(course.credits)
+    if (hasattr(marks, 'courses_of') and isinstance(courses, CourseTable)
+            and not courses.has_duplicates):
+        # Only the courses the student took, each found through the course id index
+        credit_column = courses.columns[2]
+        for course_id, mark in marks.courses_of(student.id).items():
+            position = courses.position(course_id)
+            if position is not None:
+                marks_array.append(to_tenths(mark))
+                credits_array.append(credit_column[position])
+    else:
+        for course in courses:
+            key = (student.id, course.course_id)
+            if key in marks:
+                marks_array.append(to_tenths(marks[key]))
+                credits_array.append(course.credits)
 
     if not marks_array:
         return 0.0
 
-    marks_np = np.array(marks_array)
-    credits_np = np.array(credits_array)
+    # Whole tenths times whole credits: the sums are exact integers until the division
+    marks_np = np.array(marks_array, dtype=np.int64)
+    credits_np = np.array(credits_array, dtype=np.int64)
+
+    weighted_sum = int(np.sum(marks_np * credits_np))
+    total_credits = int(np.sum(credits_np))
+
+    return weighted_sum / (total_credits * SCALE) if total_credits > 0 else 0.0
+
+
+def id_positions(records, attr):
+    """Map each id to a row number, using a table's maintained index instead of a scan"""
+    if isinstance(records, (StudentTable, CourseTable)):
+        return records.positions, len(records)
+    index = {}
+    for record in records:
+        index.setdefault(getattr(record, attr), len(index))
+    return index, len(index)
+
+
+def mark_coordinates(marks, student_index, course_index, tenths=False):
+    """(rows, cols, values) arrays of the marks whose student and course are both indexed
+
+    With tenths, values are whole tenths of a mark (see to_tenths) instead of floats.
+    """
+    if isinstance(marks, MarkStore):
+        # Translate the store's own row/column numbering into ours, -1 where unknown
+        store_rows, store_cols, values = marks.coo_tenths() if tenths else marks.coo()
+        row_map = np.array([student_index.get(sid, -1) for sid in marks.student_ids], dtype=np.intp)
+        col_map = np.array([course_index.get(cid, -1) for cid in marks.course_ids], dtype=np.intp)
+        rows, cols = row_map[store_rows], col_map[store_cols]
+        keep = (rows >= 0) & (cols >= 0)
+        return rows[keep], cols[keep], values[keep]
+    rows, cols, values = [], [], []
+    for (student_id, course_id), mark in marks.items():
+        row = student_index.get(student_id)
+        col = course_index.get(course_id)
+        if row is not None and col is not None:
+            rows.append(row)
+            cols.append(col)
+            values.append(to_tenths(mark) if tenths else mark)
+    return (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp),
+            np.array(values, dtype=np.int64 if tenths else float))
+
+
+def calculate_gpas(students, courses, marks, gpa_cache=None):
+    """Calculate every student's GPA in one pass, returned as an array aligned with students"""
+    if gpa_cache is not None:
+        return gpa_cache.gpas(students, courses, marks)
+    if hasattr(marks, 'student_sums'):
+        # The backend aggregates in place, e.g. SQL GROUP BY in SQLiteMarkStore
+        sums = {student_id: weighted / total if total else 0.0
+                for student_id, weighted, total in marks.student_sums()}
+        return np.array([sums.get(student.id, 0.0) for student in students], dtype=float)
+    student_index, n_students = id_positions(students, 'id')
+    course_index, n_courses = id_positions(courses, 'course_id')
+    if isinstance(courses, CourseTable) and not courses.has_duplicates:
+        credits = np.array(courses.columns[2], dtype=float)
+    else:
+        # Duplicate course ids each count the mark once, so their credits add up
+        credits = np.zeros(n_courses)
+        for course in courses:
+            credits[course_index[course.course_id]] += course.credits
 
-    weighted_sum = np.sum(marks_np * credits_np)
-    total_credits = np.sum(credits_np)
+    rows, cols, tenths = mark_coordinates(marks, student_index, course_index, tenths=True)
 
-    return weighted_sum / total_credits if total_credits > 0 else 0.0
+    # Sparse form of (mark matrix @ credits) / (mask @ credits). The sums are of whole
+    # tenths times whole credits, so they stay exact in float64 up to 2**53.
+    weighted_sum, total_credits = parallel.student_sums(rows, cols, tenths, credits, n_students)
+    gpas = np.divide(weighted_sum, total_credits * SCALE, out=np.zeros(n_students),
+                     where=total_credits > 0)
+    if isinstance(students, StudentTable) and not students.has_duplicates:
+        return gpas  # rows are already in table order
+    return gpas[[student_index[student.id] for student in students]]
 
 
-def show_student_gpa(stdscr, students, courses, marks):
+def show_student_gpa(stdscr, students, courses, marks, gpa_cache=None):
     """Display GPA for all students"""
     if stdscr:
         if not students:
             stdscr.addstr(5, 5, "No students available.")
             stdscr.refresh()
-            return
-        y = 5
-        stdscr.attron(curses.color_pair(3) | curses.A_BOLD)
-        stdscr.addstr(y, 5, "Student GPAs:")
-        stdscr.attroff(curses.color_pair(3) | curses.A_BOLD)
-        y += 2
-        for student in students:
-            gpa = calculate_gpa(student, courses, marks)
-            stdscr.addstr(y, 5, f"{student.name} (ID: {student.id}): GPA = {gpa:.2f}")
-            y += 1
-        stdscr.refresh()
+            return False
+        gpas = calculate_gpas(students, courses, marks, gpa_cache)
+        scroll_list(stdscr, "Student GPAs", len(students),
+                    lambda start, stop: [f"{student.name} (ID: {student.id}): GPA = {gpa:.2f}"
+                                         for student, gpa in zip(students[start:stop], gpas[start:stop])])
+        return True
     else:
         if not students:
             return print("No students available.")
+        gpas = calculate_gpas(students, courses, marks, gpa_cache)
         print("\nGPA:")
-        for student in students:
-            gpa = calculate_gpa(student, courses, marks)
+        for student, gpa in zip(students, gpas):
             print(f"{student.name} (ID: {student.id}): GPA = {gpa:.2f}")
 
 
-def sort_students_by_gpa(stdscr, students, courses, marks):
+def top_gpa_order(gpas, k=None):
+    """Indexes of the k highest GPAs in rank order, using partial selection when k is small"""
+    if k is None or k >= len(gpas):
+        return np.argsort(-gpas, kind='stable')
+    if k <= 0:
+        return np.array([], dtype=np.intp)
+    threshold = np.partition(-gpas, k - 1)[k - 1]
+    # Keep every GPA tied with the k-th so ties still resolve in input order
+    candidates = np.flatnonzero(-gpas <= threshold)
+    return candidates[np.argsort(-gpas[candidates], kind='stable')][:k]
+
+
+def rank_students_by_gpa(students, courses, marks, gpa_cache=None, start=0, stop=None):
+    """Return (student, gpa) pairs for ranks start..stop-1, highest GPA first, ties kept in input order"""
+    if gpa_cache is not None:
+        return gpa_cache.ranking(students, courses, marks, start, stop)
+    gpas = calculate_gpas(students, courses, marks)
+    return [(students[i], gpas[i]) for i in top_gpa_order(gpas, stop)[start:]]
+
+
+def sort_students_by_gpa(stdscr, students, courses, marks, gpa_cache=None):
     """Display students sorted by GPA"""
     if stdscr:
         if not students:
             stdscr.addstr(5, 5, "No students available.")
             stdscr.refresh()
-            return
-        student_gpa_list = [(student, calculate_gpa(student, courses, marks)) for student in students]
-        student_gpa_list.sort(key=lambda x: x[1], reverse=True)
-        y = 5
-        stdscr.attron(curses.color_pair(3) | curses.A_BOLD)
-        stdscr.addstr(y, 5, "Students sorted by GPA (Highest to Lowest):")
-        stdscr.attroff(curses.color_pair(3) | curses.A_BOLD)
-        y += 2
-        for rank, (student, gpa) in enumerate(student_gpa_list, 1):
-            stdscr.addstr(y, 5, f"{rank}. {student.name} (ID: {student.id}): GPA = {gpa:.2f}")
-            y += 1
-        stdscr.refresh()
+            return False
+        if gpa_cache is not None:
+            def fetch(start, stop):
+                return rank_students_by_gpa(students, courses, marks, gpa_cache, start, stop)
+        else:
+            # Select only as deep into the ranking as the user scrolls, doubling each time
+            gpas = calculate_gpas(students, courses, marks)
+            order = top_gpa_order(gpas, 0)
+
+            def fetch(start, stop):
+                nonlocal order
+                if stop > len(order):
+                    order = top_gpa_order(gpas, max(stop, 2 * len(order)))
+                return [(students[i], gpas[i]) for i in order[start:stop]]
+
+        scroll_list(stdscr, "Students sorted by GPA (Highest to Lowest)", len(students),
+                    lambda start, stop: [f"{rank}. {student.name} (ID: {student.id}): GPA = {gpa:.2f}"
+                                         for rank, (student, gpa) in enumerate(fetch(start, stop), start + 1)])
+        return True
     else:
         if not students:
             return print("No students available.")
-        student_gpa_list = [(student, calculate_gpa(student, courses, marks)) for student in students]
-        student_gpa_list.sort(key=lambda x: x[1], reverse=True)
+        student_gpa_list = rank_students_by_gpa(students, courses, marks, gpa_cache)
         print("\nSorted by GPA:")
         for rank, (student, gpa) in enumerate(student_gpa_list, 1):
             print(f"{rank}. {student.name} (ID: {student.id}): GPA = {gpa:.2f}")
 
 
+HISTOGRAM_SHADES = " .:-=+*#%@"
+
+
+def histogram_bar(counts):
+    """One character per bin, darker for fuller bins"""
+    top = max(counts) or 1
+    return "".join(HISTOGRAM_SHADES[(count * (len(HISTOGRAM_SHADES) - 1) + top - 1) // top]
+                   for count in counts)
+
+
+def format_course_stats(course, stats):
+    """One line of course statistics, or a note when the course has no marks"""
+    if not stats['count']:
+        return f"{course.course_name} (ID: {course.course_id}): no marks"
+    quantiles = " ".join(f"P{p}={value:.1f}" for p, value in stats['percentiles'].items() if p != 50)
+    # Pass rate and histogram first, so they stay visible when a narrow terminal cuts the line
+    return (f"{course.course_name} (ID: {course.course_id}): n={stats['count']} "
+            f"pass={stats['pass_rate']:.0%} [{histogram_bar(stats['histogram'])}] "
+            f"mean={stats['mean']:.2f} median={stats['median']:.2f} std={stats['std']:.2f} {quantiles}")
+
+
+def show_course_stats(stdscr, students, courses, marks):
+    """Display mark statistics for every course"""
+    if stdscr:
+        if not courses:
+            stdscr.addstr(5, 5, "No courses available.")
+            stdscr.refresh()
+            return False
+        stats = course_stats.course_statistics(students, courses, marks)
+        scroll_list(stdscr, "Course statistics (marks out of 20, histogram 0-20)", len(courses),
+                    lambda start, stop: [format_course_stats(course, stats.row(position))
+                                         for position, course in enumerate(courses[start:stop], start)])
+        return True
+    else:
+        if not courses:
+            return print("No courses available.")
+        stats = course_stats.course_statistics(students, courses, marks)
+        print("\nCourse statistics:")
+        for position, course in enumerate(courses):
+            print(format_course_stats(course, stats.row(position)))
+
+
+def menu_layout(stdscr):
+    """Return (start_y, x, width) of the main menu box"""
+    width = stdscr.getmaxyx()[1]
+    menu_width = 50
+    return 5, (width - menu_width) // 2, menu_width
+
+
+def draw_menu_row(stdscr, idx, option, selected):
+    """Draw one menu option, highlighted when selected"""
+    menu_start_y, menu_x, menu_width = menu_layout(stdscr)
+    y = menu_start_y + idx + 2
+    x = menu_x + 5
+    # Pad both states to the same width so a highlight never leaves residue behind
+    if selected:
+        stdscr.attron(curses.color_pair(5) | curses.A_BOLD)
+        stdscr.addstr(y, x, f"> {idx + 1}. {option}".ljust(menu_width - 10))
+        stdscr.attroff(curses.color_pair(5) | curses.A_BOLD)
+    else:
+        stdscr.attron(curses.color_pair(2))
+        stdscr.addstr(y, x, f"  {idx + 1}. {option}".ljust(menu_width - 10))
+        stdscr.attroff(curses.color_pair(2))
+
+
 def draw_menu(stdscr, current_row, menu_options, students, courses):
     """Draw the main menu with selection highlight"""
     stdscr.clear()
-    height, width = stdscr.getmaxyx()
     draw_title(stdscr, "STUDENT MANAGEMENT SYSTEM IN USTH")
-    menu_start_y = 5
+    menu_start_y, menu_x, menu_width = menu_layout(stdscr)
     menu_height = len(menu_options) + 4
-    menu_width = 50
-    menu_x = (width - menu_width) // 2
     draw_box(stdscr, menu_start_y, menu_x, menu_height, menu_width, "MAIN MENU")
 
     for idx, option in enumerate(menu_options):
-        y = menu_start_y + idx + 2
-        x = menu_x + 5
-
-        if idx == current_row:
-            stdscr.attron(curses.color_pair(5) | curses.A_BOLD)
-            stdscr.addstr(y, x, f"> {idx + 1}. {option}".ljust(menu_width - 10))
-            stdscr.attroff(curses.color_pair(5) | curses.A_BOLD)
-        else:
-            stdscr.attron(curses.color_pair(2))
-            stdscr.addstr(y, x, f"  {idx + 1}. {option}")
-            stdscr.attroff(curses.color_pair(2))
+        draw_menu_row(stdscr, idx, option, idx == current_row)
 
     draw_status_bar(stdscr, f" Students: {len(students)} | Courses: {len(courses)}")
-    stdscr.refresh()
+    stdscr.noutrefresh()
+    curses.doupdate()
+
+
+def move_menu_selection(stdscr, old_row, new_row, menu_options):
+    """Redraw only the two menu rows whose highlight changed"""
+    draw_menu_row(stdscr, old_row, menu_options[old_row], False)
+    draw_menu_row(stdscr, new_row, menu_options[new_row], True)
+    stdscr.noutrefresh()
+    curses.doupdate()
@@ -0,0 +1,145 @@
+import atexit
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from lazy import lazy_import
+
+np = lazy_import('numpy')
+
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# Marks below which the serial path wins over shipping work to other processes
+PARALLEL_THRESHOLD = int(os.environ.get("SMS_PARALLEL_THRESHOLD", "2000000"))
+WORKERS = int(os.environ.get("SMS_WORKERS", "0")) or available_cpus()
+LEVELS = 201  # marks 0.0-20.0 in whole tenths, as MarkStore keeps them
+
+_executor = None
+
+
+def use_parallel(n_marks, workers=None):
+    """True if n_marks is large enough to be worth sharding over more than one process"""
+    return (workers or WORKERS) > 1 and n_marks >= PARALLEL_THRESHOLD
+
+
+def executor(workers=None):
+    """Process pool shared by every call, started on first use"""
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the background saver thread may be holding locks at fork time
+        _executor = ProcessPoolExecutor(workers or WORKERS,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        atexit.register(_executor.shutdown)
+    return _executor
+
+
+class SharedArrays:
+    """NumPy arrays copied into one shared memory block that workers attach to by name"""
+
+    def __init__(self, **arrays):
+        self.layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            self.layout[name] = (offset, array.dtype.str, array.shape)
+            offset += -(-array.nbytes // 64) * 64  # keep every array cache-line aligned
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.arrays = attach_arrays(self.shm, self.layout)
+        for name, array in arrays.items():
+            self.arrays[name][...] = array
+
+    @property
+    def spec(self):
+        return self.shm.name, self.layout
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.arrays = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach_arrays(shm, layout):
+    return {name: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            for name, (offset, dtype, shape) in layout.items()}
+
+
+def _shards(n_marks, workers):
+    bounds = np.linspace(0, n_marks, workers + 1).astype(np.intp).tolist()
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _student_sums_shard(spec, shard, start, stop):
+    """Worker: credit-weighted mark sum and credit total per student for marks start..stop"""
+    name, layout = spec
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        arrays = attach_arrays(shm, layout)
+        out = arrays['out']
+        weights = arrays['credits'][arrays['cols'][start:stop]]
+        rows = arrays['rows'][start:stop]
+        out[shard, 0] = np.bincount(rows, weights=arrays['values'][start:stop] * weights,
+                                    minlength=out.shape[2])
+        out[shard, 1] = np.bincount(rows, weights=weights, minlength=out.shape[2])
+        del arrays, out, weights, rows
+    finally:
+        shm.close()
+
+
+def student_sums(rows, cols, values, credits, n_students, workers=None):
+    """(weighted mark sums, credit totals) per student row, sharded over processes for big cohorts
+
+    Sums of whole tenths times whole credits are exact, however they are sharded.
+    """
+    workers = workers or WORKERS
+    if not use_parallel(len(values), workers):
+        weights = credits[cols]
+        return (np.bincount(rows, weights=values * weights, minlength=n_students),
+                np.bincount(rows, weights=weights, minlength=n_students))
+    shards = _shards(len(values), workers)
+    with SharedArrays(rows=rows, cols=cols, values=values, credits=credits,
+                      out=np.zeros((len(shards), 2, n_students))) as shared:
+        futures = [executor(workers).submit(_student_sums_shard, shared.spec, shard, start, stop)
+                   for shard, (start, stop) in enumerate(shards)]
+        for future in futures:
+            future.result()
+        merged = shared.arrays['out'].sum(axis=0)
+    return merged[0], merged[1]
+
+
+def _course_levels_shard(spec, start, stop):
+    """Worker: per-course count of every mark level for marks start..stop"""
+    name, layout = spec
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        arrays = attach_arrays(shm, layout)
+        n_courses = int(arrays['n_courses'][0])
+        cells = arrays['cols'][start:stop] * LEVELS + arrays['tenths'][start:stop]
+        counts = np.bincount(cells, minlength=n_courses * LEVELS).reshape(n_courses, LEVELS)
+        del arrays, cells
+        return counts
+    finally:
+        shm.close()
+
+
+def course_levels(cols, tenths, n_courses, workers=None):
+    """Per-course counts of each mark in whole tenths (courses x LEVELS)
+
+    Counts from separate shards simply add up, and every statistic of a course can be
+    read exactly off its counts.
+    """
+    workers = workers or WORKERS
+    if not use_parallel(len(tenths), workers):
+        return np.bincount(cols * LEVELS + tenths,
+                           minlength=n_courses * LEVELS).reshape(n_courses, LEVELS)
+    with SharedArrays(cols=cols, tenths=tenths, n_courses=np.array([n_courses])) as shared:
+        futures = [executor(workers).submit(_course_levels_shard, shared.spec, start, stop)
+                   for start, stop in _shards(len(tenths), workers)]
+        return sum(future.result() for future in futures)
@@ -0,0 +1,262 @@
+import os
+import sqlite3
+from collections.abc import MutableMapping, MutableSequence
+
+from domains import Student, Course
+
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_FILE = os.path.join(DATA_DIR, "students.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    position INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    dob TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS students_id ON students (id);
+CREATE TABLE IF NOT EXISTS courses (
+    position INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    credits INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS courses_id ON courses (id);
+CREATE TABLE IF NOT EXISTS marks (
+    student_id TEXT NOT NULL,
+    course_id TEXT NOT NULL,
+    mark REAL NOT NULL,
+    PRIMARY KEY (student_id, course_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS marks_course ON marks (course_id);
+"""
+
+# Credit-weighted sums per student; duplicate course ids add their credits like calculate_gpa
+STUDENT_SUMS_SQL = """
+SELECT m.student_id, SUM(m.mark * c.credits), SUM(c.credits)
+FROM marks AS m
+JOIN (SELECT id, SUM(credits) AS credits FROM courses GROUP BY id) AS c ON c.id = m.course_id
+GROUP BY m.student_id
+"""
+
+
+def connect(path=DB_FILE):
+    """Open the database and create the tables if they do not exist yet"""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class _BoundRow:
+    """Mixin that writes attribute changes on a Student/Course row back to its table"""
+
+    _table = None
+    _columns = {}
+
+    def _bind(self, conn, position):
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_position', position)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        column = self._columns.get(name)
+        conn = self.__dict__.get('_conn')
+        if column and conn is not None:
+            with conn:
+                conn.execute(f"UPDATE {self._table} SET {column} = ? WHERE position = ?",
+                             (value, self._position))
+
+
+class StudentRow(_BoundRow, Student):
+    _table = 'students'
+    _columns = {'id': 'id', 'name': 'name', 'dob': 'dob'}
+
+
+class CourseRow(_BoundRow, Course):
+    _table = 'courses'
+    _columns = {'course_id': 'id', 'course_name': 'name', 'credits': 'credits'}
+
+
+class SQLiteList(MutableSequence):
+    """List of Student or Course records stored in one table, in insertion order"""
+
+    def __init__(self, conn, table, row_class, columns):
+        self.conn = conn
+        self.table = table
+        self.row_class = row_class
+        self.columns = columns  # record attributes, in table column order
+
+    def _row(self, position, values):
+        row = self.row_class(*values)
+        row._bind(self.conn, position)
+        return row
+
+    def _values(self, record):
+        return tuple(getattr(record, attr) for attr in self.columns)
+
+    def __len__(self):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            cursor = self.conn.execute(
+                f"SELECT * FROM {self.table} WHERE position >= ? AND position < ? ORDER BY position",
+                (start, stop))
+            return [self._row(row[0], row[1:]) for row in cursor][::step]
+        if index < 0:
+            index += len(self)
+        row = self.conn.execute(f"SELECT * FROM {self.table} WHERE position = ?", (index,)).fetchone()
+        if row is None:
+            raise IndexError(f"{self.table} index out of range")
+        return self._row(row[0], row[1:])
+
+    def __iter__(self):
+        cursor = self.conn.execute(f"SELECT * FROM {self.table} ORDER BY position")
+        for row in cursor:
+            yield self._row(row[0], row[1:])
+
+    def __setitem__(self, index, record):
+        if index < 0:
+            index += len(self)
+        assignments = ", ".join(f"{column} = ?" for column in self._column_names())
+        with self.conn:
+            self.conn.execute(f"UPDATE {self.table} SET {assignments} WHERE position = ?",
+                              self._values(record) + (index,))
+
+    def __delitem__(self, index):
+        if index < 0:
+            index += len(self)
+        with self.conn:
+            self.conn.execute(f"DELETE FROM {self.table} WHERE position = ?", (index,))
+            self.conn.execute(f"UPDATE {self.table} SET position = position - 1 WHERE position > ?",
+                              (index,))
+
+    def insert(self, index, record):
+        size = len(self)
+        index = max(0, min(index + size if index < 0 else index, size))
+        placeholders = ", ".join("?" * (len(self.columns) + 1))
+        with self.conn:
+            if index < size:
+                # Shift from the end so the primary key never collides mid-update
+                for position in range(size - 1, index - 1, -1):
+                    self.conn.execute(f"UPDATE {self.table} SET position = ? WHERE position = ?",
+                                      (position + 1, position))
+            self.conn.execute(f"INSERT INTO {self.table} VALUES ({placeholders})",
+                              (index,) + self._values(record))
+
+    def append(self, record):
+        placeholders = ", ".join("?" * len(self.columns))
+        with self.conn:
+            self.conn.execute(f"INSERT INTO {self.table} VALUES "
+                              f"((SELECT COUNT(*) FROM {self.table}), {placeholders})",
+                              self._values(record))
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute(f"DELETE FROM {self.table}")
+
+    def position(self, record_id):
+        """Row of the first record with this id, or None; served by the id index"""
+        row = self.conn.execute(f"SELECT MIN(position) FROM {self.table} WHERE id = ?",
+                                (record_id,)).fetchone()
+        return row[0]
+
+    def get(self, record_id, default=None):
+        position = self.position(record_id)
+        return default if position is None else self[position]
+
+    @property
+    def has_duplicates(self):
+        query = f"SELECT COUNT(DISTINCT id) < COUNT(*) FROM {self.table}"
+        return bool(self.conn.execute(query).fetchone()[0])
+
+    def add(self, record):
+        """Append a record, refusing an id that is already taken"""
+        record_id = getattr(record, self.columns[0])
+        if self.position(record_id) is not None:
+            raise ValueError(f"Duplicate {self.table[:-1]} id {record_id!r}")
+        self.append(record)
+
+    def upsert(self, record):
+        """Replace the record with the same id or append it; return True if it was added"""
+        position = self.position(getattr(record, self.columns[0]))
+        if position is None:
+            self.append(record)
+            return True
+        self[position] = record
+        return False
+
+    def _column_names(self):
+        return [self.row_class._columns[attr] for attr in self.columns]
+
+
+class SQLiteMarkStore(MutableMapping):
+    """Marks keyed by (student_id, course_id) in the marks table"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        # Called as listener(student_id, course_id, old, new) after every write
+        self.listeners = []
+
+    def __getitem__(self, key):
+        row = self.conn.execute("SELECT mark FROM marks WHERE student_id = ? AND course_id = ?",
+                                key).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return row[0]
+
+    def __setitem__(self, key, value):
+        old = self.get(key)
+        with self.conn:
+            self.conn.execute("INSERT INTO marks VALUES (?, ?, ?) "
+                              "ON CONFLICT (student_id, course_id) DO UPDATE SET mark = excluded.mark",
+                              (key[0], key[1], float(value)))
+        for listener in self.listeners:
+            listener(key[0], key[1], old, float(value))
+
+    def __delitem__(self, key):
+        old = self[key]
+        with self.conn:
+            self.conn.execute("DELETE FROM marks WHERE student_id = ? AND course_id = ?", key)
+        for listener in self.listeners:
+            listener(key[0], key[1], old, None)
+
+    def __contains__(self, key):
+        return self.conn.execute("SELECT 1 FROM marks WHERE student_id = ? AND course_id = ?",
+                                 key).fetchone() is not None
+
+    def __iter__(self):
+        return iter(self.conn.execute("SELECT student_id, course_id FROM marks"))
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM marks").fetchone()[0]
+
+    def items(self):
+        return ((tuple(row[:2]), row[2]) for row in
+                self.conn.execute("SELECT student_id, course_id, mark FROM marks"))
+
+    def courses_of(self, student_id):
+        """{course_id: mark} for one student, read through the primary key"""
+        return dict(self.conn.execute("SELECT course_id, mark FROM marks WHERE student_id = ?",
+                                      (student_id,)))
+
+    def students_of(self, course_id):
+        """{student_id: mark} for one course, read through the marks_course index"""
+        return dict(self.conn.execute("SELECT student_id, mark FROM marks WHERE course_id = ?",
+                                      (course_id,)))
+
+    def student_sums(self):
+        """(student_id, weighted mark sum, total credits) for every student, aggregated in SQL"""
+        return self.conn.execute(STUDENT_SUMS_SQL)
+
+
+def open_collections(path=DB_FILE):
+    """Return (conn, students, courses, marks) backed by the SQLite file at path"""
+    conn = connect(path)
+    students = SQLiteList(conn, 'students', StudentRow, ('id', 'name', 'dob'))
+    courses = SQLiteList(conn, 'courses', CourseRow, ('course_id', 'course_name', 'credits'))
+    return conn, students, courses, SQLiteMarkStore(conn)